@@ -2,7 +2,7 @@ from flask import Flask, render_template
 from flask_cors import CORS
 from dotenv import load_dotenv
 from app.config import Config
-from app.database import db
+from app.database import db, engine_options, configure_engine, ensure_indexes, upgrade_sqlite_history
 from app.utils import validate_environment, validate_database_connection
 import logging
 import sys
@@ -21,12 +21,14 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "fallback-secret")
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL", "sqlite:///chat_history.db")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
     # Enable CORS for all routes
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
     # Init database
     db.init_app(app)
+    configure_engine(app)
 
     # Configure logging
     logging.basicConfig(
@@ -50,6 +52,12 @@ def create_app():
         logger.error("Database configuration is invalid")
 
     # Register blueprints
+    from app.services.cache import response_cache
+    from app.services.gemini_api import gemini_service
+    from app.services.history_writer import history_writer
+    from app.services.session_buffer import session_buffer
+    from app.services.tts_cache import audio_cache
+    from app.services.tts_engine import tts_engine
     from app.routes.chat import chat_bp
     from app.routes.voice import voice_bp
     from app.routes.wakeword import wakeword_bp
@@ -58,6 +66,15 @@ def create_app():
     app.register_blueprint(voice_bp)
     app.register_blueprint(wakeword_bp)
 
+    # CLI commands (flask compact-history, ...)
+    from app.cli import register_commands
+    register_commands(app)
+
+    @app.context_processor
+    def inject_client_config():
+        # Read by wakeword.js; unset means wake-word audio is posted over HTTP
+        return {"wakeword_stream_url": Config.WAKEWORD_STREAM_URL or None}
+
     # Main routes
     @app.route("/")
     def index():
@@ -71,8 +88,17 @@ def create_app():
     def health_check():
         """Health check endpoint for monitoring"""
         try:
-            db.session.execute('SELECT 1')
-            return {"status": "healthy", "database": "connected"}, 200
+            db.session.execute(db.text('SELECT 1'))
+            return {
+                "status": "healthy",
+                "database": "connected",
+                "cache": response_cache.stats(),
+                "gemini": gemini_service.stats(),
+                "history_writer": history_writer.stats(),
+                "session_buffer": session_buffer.stats(),
+                "audio_cache": audio_cache.stats(),
+                "tts_engine": tts_engine.stats(),
+            }, 200
         except Exception as e:
             logger.error(f"Health check failed: {e}")
             return {"status": "unhealthy", "database": "disconnected", "error": str(e)}, 500
@@ -89,7 +115,14 @@ def create_app():
         return render_template("error.html", error_message=error_message), 500
 
     # Create tables
+    from app.services.history_search import ensure_search_index
     with app.app_context():
         db.create_all()
+        upgrade_sqlite_history()
+        ensure_indexes()
+        ensure_search_index()
+
+    # Start write-behind persistence for chat history (if enabled)
+    history_writer.init_app(app)
 
     return app
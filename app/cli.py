@@ -0,0 +1,71 @@
+from app.config import Config
+from app.utils.cursors import decode_cursor
+import click
+import sys
+
+def register_commands(app):
+    """Attach the app's maintenance commands to `flask`"""
+
+    @app.cli.command("compact-history")
+    @click.option("--retention-days", type=int, default=Config.ARCHIVE_RETENTION_DAYS, show_default=True,
+                  help="Archive sessions with no messages for this many days.")
+    def compact_history(retention_days):
+        """Move idle chat sessions into compressed archive files."""
+        from app.services.history_archive import history_archiver
+
+        history_archiver.retention_days = retention_days
+        result = history_archiver.compact()
+        click.echo(f"Archived {result['sessions']} sessions ({result['messages']} messages)")
+        for name in result["dropped_partitions"]:
+            click.echo(f"Dropped empty partition {name}")
+
+    @app.cli.command("export-history")
+    @click.option("--output", "-o", type=click.Path(dir_okay=False), required=True,
+                  help="Where to write the gzip-compressed NDJSON ('-' for stdout).")
+    @click.option("--start", type=click.DateTime(), default=None, help="Only messages at or after this time (UTC).")
+    @click.option("--end", type=click.DateTime(), default=None, help="Only messages before this time (UTC).")
+    @click.option("--after", "after_cursor", default=None,
+                  help="Resume after this cursor (the `cursor` of the last exported line); "
+                       "output is appended as a new gzip member.")
+    @click.option("--session-id", default=None, help="Only this session.")
+    @click.option("--skip-archived", is_flag=True,
+                  help="Leave out sessions that compact-history moved to the archive.")
+    def export_history(output, start, end, after_cursor, session_id, skip_archived):
+        """Stream chat history, archived sessions included, to a gzip-compressed NDJSON file."""
+        from app.services.history_export import HistoryExport
+
+        try:
+            after = decode_cursor(after_cursor) if after_cursor else None
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--after")
+
+        export = HistoryExport(start=start, end=end, after=after, session_id=session_id,
+                               include_archived=not skip_archived)
+        out = sys.stdout.buffer if output == "-" else open(output, "ab" if after else "wb")
+        to_file = out is not sys.stdout.buffer
+        written = out.tell() if to_file else 0  # End of the last chunk written in full
+        try:
+            for chunk in export:
+                out.write(chunk)
+                if to_file:
+                    out.flush()
+                    written = out.tell()
+        except KeyboardInterrupt:
+            if to_file:
+                # Drop a partly written chunk, so the file ends on a complete gzip member
+                out.truncate(written)
+            resume = f"; resume with --after {export.last_cursor}" if export.last_cursor else ""
+            click.echo(f"Interrupted after {export.rows} rows{resume}", err=True)
+            raise SystemExit(1)
+        finally:
+            out.flush()
+            if out is not sys.stdout.buffer:
+                out.close()
+
+        click.echo(f"Exported {export.rows} rows at {export.rows_per_second():.0f} rows/s", err=True)
+        if export.last_cursor:
+            click.echo(f"Last cursor: {export.last_cursor}", err=True)
+        if skip_archived:
+            skipped = export.archived_sessions()
+            if skipped:
+                click.echo(f"Skipped {skipped} archived sessions in range (--skip-archived)", err=True)
@@ -13,14 +13,119 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///yara_assistant.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Database engine tuning (see app/database.py engine_options)
+    WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 2))  # gunicorn workers sharing DB_MAX_CONNECTIONS
+    DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", 20))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 2))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))  # seconds
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))  # seconds
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 15000))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
     # API Keys
     GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")  # Optional fallback for TTS
 
+    # Gemini model tiers (p95 latency SLOs in milliseconds)
+    GEMINI_PRIMARY_MODEL = os.environ.get("GEMINI_PRIMARY_MODEL", "models/gemini-2.5-pro")
+    GEMINI_FAST_MODEL = os.environ.get("GEMINI_FAST_MODEL", "models/gemini-2.5-flash")
+    GEMINI_PRIMARY_SLO_MS = int(os.environ.get("GEMINI_PRIMARY_SLO_MS", 8000))
+    GEMINI_FAST_SLO_MS = int(os.environ.get("GEMINI_FAST_SLO_MS", 2500))
+
+    # Request deadlines (seconds) and hedged upstream requests
+    CHAT_DEADLINE_SECONDS = float(os.environ.get("CHAT_DEADLINE_SECONDS", 25))
+    VOICE_DEADLINE_SECONDS = float(os.environ.get("VOICE_DEADLINE_SECONDS", 10))
+    UPSTREAM_THREADS = int(os.environ.get("UPSTREAM_THREADS", 16))
+    GEMINI_HEDGE_ENABLED = os.environ.get("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+    GEMINI_HEDGE_AFTER_MS = int(os.environ.get("GEMINI_HEDGE_AFTER_MS", 0))  # 0 = model's rolling p95
+
+    # Upstream health: adaptive concurrency and circuit breaker
+    UPSTREAM_MAX_CONCURRENCY = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", 16))
+    UPSTREAM_LATENCY_TARGET_MS = int(os.environ.get("UPSTREAM_LATENCY_TARGET_MS", 10000))
+    UPSTREAM_FAILURE_THRESHOLD = int(os.environ.get("UPSTREAM_FAILURE_THRESHOLD", 5))
+    UPSTREAM_OPEN_SECONDS = int(os.environ.get("UPSTREAM_OPEN_SECONDS", 15))
+
+    # Response cache
+    RESPONSE_CACHE_MAX_SIZE = int(os.environ.get("RESPONSE_CACHE_MAX_SIZE", 1000))
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 3600))  # seconds
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Node-wide response cache shared by gunicorn workers (empty path disables it)
+    SHARED_CACHE_PATH = os.environ.get(
+        "SHARED_CACHE_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "response_cache.db"),
+    )
+    SHARED_CACHE_TTL = int(os.environ.get("SHARED_CACHE_TTL", 86400))  # seconds
+    SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("SHARED_CACHE_MAX_ENTRIES", 100000))
+
+    # Near-duplicate matching for context-free queries (threshold > 1 disables it)
+    QUERY_SIMILARITY_THRESHOLD = float(os.environ.get("QUERY_SIMILARITY_THRESHOLD", 0.95))
+    QUERY_INDEX_SIZE = int(os.environ.get("QUERY_INDEX_SIZE", 2048))
+    QUERY_INDEX_DIM = int(os.environ.get("QUERY_INDEX_DIM", 1024))
+
+    # Conversation context sent with multi-turn prompts
+    CONVERSATION_MAX_SESSIONS = int(os.environ.get("CONVERSATION_MAX_SESSIONS", 1000))
+    CONVERSATION_RECENT_TURNS = int(os.environ.get("CONVERSATION_RECENT_TURNS", 6))
+    CONVERSATION_RECENT_TOKENS = int(os.environ.get("CONVERSATION_RECENT_TOKENS", 1200))
+    CONVERSATION_SUMMARY_TOKENS = int(os.environ.get("CONVERSATION_SUMMARY_TOKENS", 400))
+
+    # Hot in-memory buffer of recent messages per active session
+    SESSION_BUFFER_TURNS = int(os.environ.get("SESSION_BUFFER_TURNS", 50))
+    SESSION_BUFFER_MAX_SESSIONS = int(os.environ.get("SESSION_BUFFER_MAX_SESSIONS", 2000))
+    SESSION_BUFFER_MAX_BYTES = int(os.environ.get("SESSION_BUFFER_MAX_BYTES", 64 * 1024 * 1024))
+    SESSION_BUFFER_TRUST_SECONDS = float(os.environ.get("SESSION_BUFFER_TRUST_SECONDS", 2))  # 0 = check the database on every read
+
+    # Chat history persistence (write-behind batches inserts off the request path)
+    HISTORY_WRITE_BEHIND = os.environ.get("HISTORY_WRITE_BEHIND", "false").lower() == "true"
+    HISTORY_QUEUE_SIZE = int(os.environ.get("HISTORY_QUEUE_SIZE", 10000))
+    HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", 200))
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", 0.5))  # seconds
+
+    # Archival of idle sessions (flask compact-history)
+    ARCHIVE_DIR = os.environ.get(
+        "ARCHIVE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "archive"),
+    )
+    ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", 30))
+    ARCHIVE_BATCH_SESSIONS = int(os.environ.get("ARCHIVE_BATCH_SESSIONS", 500))
+
+    # Bulk export endpoint (GET /api/chat/export); disabled unless a token is set
+    EXPORT_API_TOKEN = os.environ.get("EXPORT_API_TOKEN")
+
+    # Text-to-speech engine (one asyncio loop per process)
+    TTS_MAX_SESSIONS = int(os.environ.get("TTS_MAX_SESSIONS", 8))  # Concurrent edge-tts syntheses
+    TTS_VOICE_CACHE_TTL = int(os.environ.get("TTS_VOICE_CACHE_TTL", 3600))  # seconds
+    TTS_TIMEOUT = float(os.environ.get("TTS_TIMEOUT", 30))  # seconds
+
+    # Disk cache for synthesized speech, shared by workers (empty path disables it)
+    TTS_CACHE_DIR = os.environ.get(
+        "TTS_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance", "tts_cache"),
+    )
+    TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    # Pipelined voice replies: sentences synthesized at once, and the shortest sentence synthesized alone
+    VOICE_PIPELINE_MAX_PARALLEL = int(os.environ.get("VOICE_PIPELINE_MAX_PARALLEL", 3))
+    VOICE_PIPELINE_MIN_SENTENCE_CHARS = int(os.environ.get("VOICE_PIPELINE_MIN_SENTENCE_CHARS", 20))
+
     # Wake Word Settings
     WAKE_WORD = "yara"
     WAKE_WORD_SENSITIVITY = 0.6
 
+    # WebSocket wake-word stream server (wakeword_server.py)
+    WAKEWORD_WS_HOST = os.environ.get("WAKEWORD_WS_HOST", "0.0.0.0")
+    WAKEWORD_WS_PORT = int(os.environ.get("WAKEWORD_WS_PORT", 8765))
+    WAKEWORD_WS_MAX_STREAMS = int(os.environ.get("WAKEWORD_WS_MAX_STREAMS", 500))  # Concurrent connections per process
+    WAKEWORD_WS_IDLE_TIMEOUT = float(os.environ.get("WAKEWORD_WS_IDLE_TIMEOUT", 30))  # seconds without a frame
+    WAKEWORD_WS_THREADS = int(os.environ.get("WAKEWORD_WS_THREADS", os.cpu_count() or 4))  # Recognizer threads
+    WAKEWORD_WS_MAX_FRAME_BYTES = int(os.environ.get("WAKEWORD_WS_MAX_FRAME_BYTES", 64 * 1024))
+    # HTTP wake-word detection (/api/wakeword/detect): per-client recognizers
+    WAKEWORD_HTTP_IDLE_TIMEOUT = float(os.environ.get("WAKEWORD_HTTP_IDLE_TIMEOUT", 30))  # seconds before a client's recognizer is dropped
+    WAKEWORD_HTTP_MAX_CLIENTS = int(os.environ.get("WAKEWORD_HTTP_MAX_CLIENTS", 1000))  # Recognizers kept per process
+    # Public ws(s):// URL browsers use to reach the stream server; empty = HTTP detection only
+    WAKEWORD_STREAM_URL = os.environ.get("WAKEWORD_STREAM_URL", "")
+
     # Voice Settings
     TTS_SERVICE = "edge-tts"       # Free and fast option
     STT_SERVICE = "web-speech-api" # Browser-based
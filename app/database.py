@@ -1,3 +1,147 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app.config import Config
+import logging
+import uuid
 
 db = SQLAlchemy()
+
+def engine_options(database_url):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the database behind `database_url`.
+
+    Postgres gets a connection pool sized so that every gunicorn worker
+    together stays within DB_MAX_CONNECTIONS, pre-ping, recycling, and a
+    server-side statement timeout. SQLite is configured per connection by
+    the pragmas in configure_engine() instead.
+    """
+    backend = make_url(database_url).get_backend_name()
+
+    if backend == "sqlite":
+        # Wait on locks in Python too, not only in SQLite's busy handler
+        return {"connect_args": {"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+    if backend == "postgresql":
+        workers = max(1, Config.WEB_CONCURRENCY)
+        return {
+            "pool_size": max(1, Config.DB_MAX_CONNECTIONS // workers),
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            "pool_timeout": Config.DB_POOL_TIMEOUT,
+            "pool_recycle": Config.DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            "connect_args": {"options": f"-c statement_timeout={Config.DB_STATEMENT_TIMEOUT_MS}"},
+        }
+
+    return {"pool_pre_ping": True}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers run alongside the single writer; NORMAL syncs at checkpoints only
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def configure_engine(app):
+    """Apply per-connection settings to the app's engine; call after db.init_app(app)"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+
+def ensure_indexes():
+    """
+    Create model indexes missing from SQLite tables that already existed
+    (create_all only indexes the tables it creates), and drop the
+    session_id index the composite history index replaces. Postgres
+    indexes come from the Supabase migrations. Call inside an app context.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_chat_history_session_id")
+
+# SQLite layout of chat_history. `seq` is an INTEGER PRIMARY KEY, i.e. an alias
+# of the rowid, so it never changes (VACUUM may renumber the implicit rowid of
+# a table without one) and the full-text index can use it as its key. The
+# application addresses rows by `id` and never sets `seq`.
+_SQLITE_HISTORY_DDL = """
+    CREATE TABLE chat_history_upgraded (
+        seq INTEGER PRIMARY KEY,
+        id CHAR(32) NOT NULL UNIQUE,
+        session_id VARCHAR(255) NOT NULL,
+        message TEXT NOT NULL,
+        is_user BOOLEAN NOT NULL,
+        timestamp DATETIME NOT NULL
+    )
+"""
+
+def upgrade_sqlite_history():
+    """
+    Rebuild an SQLite chat_history table that predates the current layout
+    (integer ids, or no `seq` column); call inside an app context, before
+    ensure_indexes() and ensure_search_index().
+
+    Integer ids become legacy_uuid(timestamp, id), so cursors issued before
+    still find their rows. Rows are copied in (timestamp, id) order, the old
+    table and its full-text index are dropped, and the rest is recreated by
+    the ensure_* functions. Runs in one IMMEDIATE transaction, so workers
+    starting together upgrade the table once.
+    """
+    from app.utils.ids import legacy_uuid
+
+    if db.engine.dialect.name != "sqlite":
+        return
+    raw = db.engine.raw_connection()
+    connection = raw.driver_connection
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None  # Manage the transaction explicitly, DDL included
+    cursor = connection.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        columns = {row[1]: row[2].upper() for row in cursor.execute("PRAGMA table_info(chat_history)")}
+        if not columns or "seq" in columns:
+            cursor.execute("COMMIT")
+            return
+
+        cursor.execute(_SQLITE_HISTORY_DDL)
+        if columns.get("id") == "INTEGER":
+            rows = cursor.execute(
+                "SELECT id, session_id, message, is_user, timestamp FROM chat_history ORDER BY timestamp, id"
+            ).fetchall()
+            cursor.executemany(
+                "INSERT INTO chat_history_upgraded (id, session_id, message, is_user, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (uuid.UUID(legacy_uuid(datetime.fromisoformat(timestamp), row_id)).hex,
+                     session_id, message, is_user, timestamp)
+                    for row_id, session_id, message, is_user, timestamp in rows
+                ],
+            )
+        else:
+            cursor.execute(
+                "INSERT INTO chat_history_upgraded (id, session_id, message, is_user, timestamp) "
+                "SELECT id, session_id, message, is_user, timestamp FROM chat_history ORDER BY timestamp, id"
+            )
+        copied = cursor.execute("SELECT count(*) FROM chat_history_upgraded").fetchone()[0]
+        cursor.execute("DROP TABLE IF EXISTS chat_history_fts")
+        cursor.execute("DROP TABLE chat_history")  # Its indexes and triggers go with it
+        cursor.execute("ALTER TABLE chat_history_upgraded RENAME TO chat_history")
+        cursor.execute("COMMIT")
+        logging.info(f"Upgraded the chat_history table ({copied} rows)")
+    except Exception:
+        if connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        cursor.close()
+        connection.isolation_level = isolation_level
+        raw.close()
@@ -1,4 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 
 # Initialize SQLAlchemy
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+# Importing the package registers every model's table for db.create_all()
+from app.models.chat_history import ChatHistory  # noqa: E402
+from app.models.chat_history_archive import ChatHistoryArchive  # noqa: E402
+
+__all__ = ["ChatHistory", "ChatHistoryArchive"]
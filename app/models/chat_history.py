@@ -1,12 +1,18 @@
 # AI_VOICE_ASSISTANT_WEB/app/models/chat_history.py
 from datetime import datetime
 from app.database import db
+from app.utils.ids import uuid7
 
 class ChatHistory(db.Model):
     __tablename__ = 'chat_history'
+    __table_args__ = (
+        # Serves session lookups and keyset pagination over (timestamp, id)
+        db.Index('idx_chat_history_session_timestamp', 'session_id', 'timestamp'),
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.String(255), nullable=False, index=True)
+    # Time-ordered UUIDv7, generated by the application (native uuid on Postgres)
+    id = db.Column(db.Uuid(as_uuid=False), primary_key=True, default=uuid7)
+    session_id = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_user = db.Column(db.Boolean, nullable=False, default=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,21 @@
+from datetime import datetime
+from app.database import db
+
+class ChatHistoryArchive(db.Model):
+    """Where an archived session's messages live: one gzip member inside a monthly archive file"""
+
+    __tablename__ = 'chat_history_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(255), nullable=False, index=True)
+    month = db.Column(db.String(7), nullable=False)  # "YYYY-MM" of the session's last message
+    path = db.Column(db.String(512), nullable=False)  # Relative to ARCHIVE_DIR
+    byte_offset = db.Column(db.BigInteger, nullable=False)  # Start of the gzip member in the file
+    length = db.Column(db.Integer, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    first_timestamp = db.Column(db.DateTime, nullable=False)
+    last_timestamp = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChatHistoryArchive {self.session_id} in {self.path}>'
@@ -1,9 +1,25 @@
 # app/routes/chat.py
 
-from flask import Blueprint, request, jsonify, session, render_template
-from app.services.gemini_api import gemini_service
+from flask import Blueprint, Response, request, jsonify, session, render_template, stream_with_context
+from app.services.gemini_api import StreamInterrupted, gemini_service
+from app.services.conversation import conversation_memory
+from app.services.deadline import Deadline
+from app.config import Config
+from app.services.upstream_health import UpstreamUnavailable
+from app.services.history_writer import history_writer
+from app.services.session_buffer import session_buffer
+from app.services.history_archive import history_archiver
+from app.services.history_search import search_history
+from app.services.history_export import HistoryExport
+from middleware.rate_limit_handler import handle_rate_limit_errors
 from app.models.chat_history import ChatHistory
 from app.database import db
+from app.utils.cursors import encode_cursor, decode_cursor
+from contextlib import closing
+from datetime import datetime
+import hmac
+import json
+import logging
 import uuid
 
 chat_bp = Blueprint("chat_bp", __name__, url_prefix="/api/chat")
@@ -13,6 +29,7 @@ def chat_page():
     return render_template("chat.html")
 
 @chat_bp.route("", methods=["POST"])
+@handle_rate_limit_errors
 def chat_api():
     try:
         data = request.get_json()
@@ -23,43 +40,289 @@ def chat_api():
         if "session_id" not in session:
             session["session_id"] = str(uuid.uuid4())
         session_id = session["session_id"]
+        deadline = Deadline(Config.CHAT_DEADLINE_SECONDS)
 
-        user_chat = ChatHistory(session_id=session_id, message=message, is_user=True)
-        db.session.add(user_chat)
+        received_at = datetime.utcnow()
+        context = conversation_memory.context(session_id)
 
-        ai_response = gemini_service.generate_response(message)
+        ai_response = gemini_service.get_chat_response(
+            message, context.recent, summary=context.summary, deadline=deadline
+        )
 
-        ai_chat = ChatHistory(session_id=session_id, message=ai_response, is_user=False)
-        db.session.add(ai_chat)
-        db.session.commit()
+        reply_key = history_writer.add_exchange(session_id, message, ai_response, user_timestamp=received_at)
+        conversation_memory.record(session_id, message, ai_response, reply_key)
 
         return jsonify({"response": ai_response, "session_id": session_id})
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@chat_bp.route("/stream", methods=["POST"])
+def chat_stream():
+    """Stream the AI reply as Server-Sent Events while Gemini generates it"""
+    data = request.get_json(silent=True) or {}
+    message = data.get("message", "").strip()
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+
+    if "session_id" not in session:
+        session["session_id"] = str(uuid.uuid4())
+    session_id = session["session_id"]
+
+    received_at = datetime.utcnow()
+    context = conversation_memory.context(session_id)
+    deadline = Deadline(Config.CHAT_DEADLINE_SECONDS)
+
+    def generate():
+        parts = []
+        completed = False
+        try:
+            yield _sse_event("start", {"session_id": session_id})
+            pieces = gemini_service.get_chat_response_stream(
+                message, context.recent, summary=context.summary, deadline=deadline
+            )
+            with closing(pieces):
+                for piece in pieces:
+                    parts.append(piece)
+                    yield _sse_event("token", {"text": piece})
+            completed = True
+            yield _sse_event("done", {"session_id": session_id})
+        except StreamInterrupted as e:
+            yield _sse_event("error", {"error": str(e), "session_id": session_id})
+        finally:
+            # Runs on normal completion, when the reply broke off, and when
+            # the client goes away (the server closes this generator). Only
+            # a finished reply is stored as an AI message; the user's
+            # message is always kept.
+            try:
+                if completed:
+                    ai_response = "".join(parts).strip()
+                    reply_key = history_writer.add_exchange(session_id, message, ai_response, user_timestamp=received_at)
+                    conversation_memory.record(session_id, message, ai_response, reply_key)
+                else:
+                    logging.info(f"Chat stream for session {session_id} ended before completion")
+                    history_writer.add_rows([{
+                        "session_id": session_id, "message": message, "is_user": True, "timestamp": received_at,
+                    }])
+            except Exception as e:
+                logging.error(f"Failed to persist streamed chat: {e}")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
+
+def _history_item(row):
+    return {
+        "message": row.message,
+        "is_user": row.is_user,
+        "timestamp": row.timestamp.isoformat(),
+        "cursor": encode_cursor(row.timestamp, row.id),
+    }
+
+def _history_columns():
+    return db.select(ChatHistory.id, ChatHistory.message, ChatHistory.is_user, ChatHistory.timestamp)
+
+def _stream_history(session_id):
+    """Yield the whole session as one JSON document, row by row"""
+    query = (
+        _history_columns()
+        .where(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.timestamp, ChatHistory.id)
+        .execution_options(stream_results=True, yield_per=500)
+    )
+    yield '{"history": ['
+    first = True
+    for row in db.session.execute(query):
+        yield ("" if first else ",") + json.dumps(_history_item(row))
+        first = False
+    yield "]}"
+
+def _recent_page_from_buffer(session_id, limit):
+    """The newest history page served from the session buffer, or None if it can't answer"""
+    turns, complete = session_buffer.recent(session_id, limit + 1)
+    has_more = len(turns) > limit
+    if not has_more and not complete:
+        return None
+    turns = turns[-limit:]
+    history = [_history_item(turn) for turn in turns]
+    return {
+        "history": history,
+        "has_more": has_more,
+        "before": history[0]["cursor"] if history else None,
+        "after": history[-1]["cursor"] if history else None,
+    }
+
 @chat_bp.route("/history", methods=["GET"])
 def get_chat_history():
+    """
+    Page through the current session's messages, oldest first within a page.
+
+    Query parameters:
+        limit: page size (default 100, max 500)
+        before: cursor; return the messages just before it (older page)
+        after: cursor; return the messages just after it (newer page)
+        stream: "1" streams the entire session instead of a page
+
+    Without a cursor the most recent page is returned. Pages come from
+    keyset queries on (timestamp, id), so every page costs the same no
+    matter how long the session is.
+    """
     try:
         session_id = session.get("session_id")
         if not session_id:
             return jsonify({"history": []})
 
-        history = (
-            ChatHistory.query
-            .filter_by(session_id=session_id)
-            .order_by(ChatHistory.timestamp)
-            .all()
-        )
+        # Make sure this session's queued writes are visible
+        history_writer.wait_for_session(session_id)
+
+        if request.args.get("stream") == "1":
+            return Response(stream_with_context(_stream_history(session_id)), mimetype="application/json")
+
+        try:
+            limit = min(max(int(request.args.get("limit", HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+            before = request.args.get("before")
+            after = request.args.get("after")
+            before_key = decode_cursor(before) if before else None
+            after_key = decode_cursor(after) if after else None
+        except ValueError:
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+
+        if not before_key and not after_key:
+            page = _recent_page_from_buffer(session_id, limit)
+            if page is not None:
+                return jsonify(page)
+
+        key = db.tuple_(ChatHistory.timestamp, ChatHistory.id)
+        query = _history_columns().where(ChatHistory.session_id == session_id)
+        if after_key:
+            query = query.where(key > after_key)
+            if before_key:
+                query = query.where(key < before_key)
+            query = query.order_by(ChatHistory.timestamp, ChatHistory.id)
+        else:
+            if before_key:
+                query = query.where(key < before_key)
+            query = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not after_key:
+            rows.reverse()
+
+        history = [_history_item(row) for row in rows]
+        return jsonify({
+            "history": history,
+            "has_more": has_more,
+            "before": history[0]["cursor"] if history else None,
+            "after": history[-1]["cursor"] if history else None,
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@chat_bp.route("/history/archived", methods=["GET"])
+def get_archived_history():
+    """Messages of the current session that the compaction job has moved to the archive"""
+    try:
+        session_id = session.get("session_id")
+        if not session_id:
+            return jsonify({"history": []})
+        history = [
+            {"message": item["message"], "is_user": item["is_user"], "timestamp": item["timestamp"]}
+            for item in history_archiver.read_session(session_id)
+        ]
+        return jsonify({"history": history})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+def _has_export_token():
+    """True if the request carries `Authorization: Bearer <EXPORT_API_TOKEN>`"""
+    token = Config.EXPORT_API_TOKEN
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return bool(token) and hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+@chat_bp.route("/search", methods=["GET"])
+def search_chat_history():
+    """
+    Full-text search over chat messages, best match first.
 
+    Query parameters:
+        q: search text (required)
+        session_id: another session to search; requires the export token
+            (`Authorization: Bearer <EXPORT_API_TOKEN>`), otherwise only the
+            current session is searched
+        limit: results per page (default 20, max 100)
+        page: 1-based page number
+    """
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+
+    try:
+        limit = min(max(int(request.args.get("limit", SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        page = max(int(request.args.get("page", 1)), 1)
+    except ValueError:
+        return jsonify({"error": "Invalid limit or page"}), 400
+
+    session_id = session.get("session_id")
+    if request.args.get("session_id"):
+        if not _has_export_token():
+            return jsonify({"error": "Searching other sessions is not authorized"}), 403
+        session_id = request.args["session_id"]
+    if not session_id:
+        return jsonify({"results": [], "page": page, "has_more": False})
+
+    try:
+        # One extra row tells whether another page exists
+        results = search_history(query, session_id=session_id, limit=limit + 1, offset=(page - 1) * limit)
         return jsonify({
-            "history": [
-                {
-                    "message": c.message,
-                    "is_user": c.is_user,
-                    "timestamp": c.timestamp.isoformat()
-                }
-                for c in history
-            ]
+            "results": results[:limit],
+            "page": page,
+            "has_more": len(results) > limit,
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@chat_bp.route("/export", methods=["GET"])
+def export_chat_history():
+    """
+    Stream chat history of every session as gzip-compressed NDJSON.
+
+    Requires `Authorization: Bearer <EXPORT_API_TOKEN>`. Query parameters
+    (all optional): start and end (ISO timestamps, UTC), session_id, after
+    (the `cursor` of the last line received, to resume), and archived=0 to
+    leave out archived sessions (counted in X-Archived-Sessions-Skipped).
+    """
+    if not _has_export_token():
+        return jsonify({"error": "Export is not authorized"}), 403
+
+    try:
+        start = request.args.get("start")
+        end = request.args.get("end")
+        after = request.args.get("after")
+        export = HistoryExport(
+            start=datetime.fromisoformat(start) if start else None,
+            end=datetime.fromisoformat(end) if end else None,
+            after=decode_cursor(after) if after else None,
+            session_id=request.args.get("session_id"),
+            include_archived=request.args.get("archived") != "0",
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    headers = {"Content-Disposition": "attachment; filename=chat_history.ndjson.gz"}
+    if not export.include_archived:
+        headers["X-Archived-Sessions-Skipped"] = str(export.archived_sessions())
+    return Response(stream_with_context(export), mimetype="application/gzip", headers=headers)
@@ -1,15 +1,82 @@
-from flask import Blueprint, request, jsonify, session
-from app.services.gemini_api import gemini_service
-from app.services.tts_api import TTSService
-from app.models.chat_history import ChatHistory
-from app.database import db
+from flask import Blueprint, Response, request, jsonify, session, send_file, stream_with_context, url_for
+from app.services.gemini_api import StreamInterrupted, gemini_service
+from app.services.conversation import conversation_memory
+from app.services.deadline import Deadline
+from app.config import Config
+from app.services.upstream_health import UpstreamUnavailable
+from app.services.history_writer import history_writer
+from middleware.rate_limit_handler import handle_rate_limit_errors
+from app.services.tts_api import TTSService, tts_service as default_tts_service
+from app.services.tts_cache import audio_cache
+from app.services.voice_pipeline import voice_pipeline
+from contextlib import closing
+from datetime import datetime
+import logging
+import json
+import io
+import os
+import struct
+import time
 import uuid
 import base64
 
 # Use /api/voice as the base prefix so it matches frontend
 voice_bp = Blueprint('voice', __name__, url_prefix='/api/voice')
 
+# Response formats of /process, chosen by the Accept header; JSON (with
+# base64 audio) comes first so it stays the default
+VOICE_ENVELOPE_MIMETYPE = 'application/vnd.yara.voice'
+VOICE_RESPONSE_MIMETYPES = ['application/json', 'multipart/mixed', VOICE_ENVELOPE_MIMETYPE]
+AUDIO_MIMETYPE = 'audio/mpeg'
+
+def _open_audio(digest, tts_service, text):
+    """(file, size) of the reply's audio: the cached file, or synthesized now if there is none"""
+    if digest:
+        try:
+            audio_file = open(audio_cache.path(digest), 'rb')
+            return audio_file, os.fstat(audio_file.fileno()).st_size
+        except FileNotFoundError:
+            pass  # Evicted meanwhile
+    audio = tts_service.text_to_speech(text)
+    return io.BytesIO(audio), len(audio)
+
+def _binary_voice_response(mimetype, metadata, audio_file, audio_size):
+    """
+    The reply's metadata and raw audio in one body, without base64.
+
+    multipart/mixed: a JSON part followed by an audio/mpeg part.
+    application/vnd.yara.voice: a 4-byte big-endian length, that many
+    bytes of JSON, then the audio up to the end of the body.
+    The audio is streamed from its file rather than read into memory.
+    """
+    metadata = json.dumps(dict(metadata, audio_type=AUDIO_MIMETYPE, audio_length=audio_size)).encode('utf-8')
+    if mimetype == 'multipart/mixed':
+        boundary = uuid.uuid4().hex
+        head = (
+            f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('ascii') + metadata +
+            f'\r\n--{boundary}\r\nContent-Type: {AUDIO_MIMETYPE}\r\nContent-Length: {audio_size}\r\n\r\n'.encode('ascii')
+        )
+        tail = f'\r\n--{boundary}--\r\n'.encode('ascii')
+        content_type = f'multipart/mixed; boundary={boundary}'
+    else:
+        head = struct.pack('>I', len(metadata)) + metadata
+        tail = b''
+        content_type = VOICE_ENVELOPE_MIMETYPE
+
+    def body():
+        try:
+            yield head
+            for chunk in iter(lambda: audio_file.read(64 * 1024), b''):
+                yield chunk
+            yield tail
+        finally:
+            audio_file.close()
+
+    return Response(body(), content_type=content_type,
+                    headers={'Content-Length': str(len(head) + audio_size + len(tail))})
+
 @voice_bp.route('/process', methods=['POST'])
+@handle_rate_limit_errors
 def process_voice():
     try:
         data = request.get_json()
@@ -22,29 +89,185 @@ def process_voice():
         if 'session_id' not in session:
             session['session_id'] = str(uuid.uuid4())
         session_id = session['session_id']
+        deadline = Deadline(Config.VOICE_DEADLINE_SECONDS)
         
-        # Save user message
-        user_chat = ChatHistory(session_id=session_id, message=text, is_user=True)
-        db.session.add(user_chat)
+        received_at = datetime.utcnow()
+        
+        # Conversation context
+        context = conversation_memory.context(session_id)
         
         # AI response
-        ai_response = gemini_service.generate_response(text)
+        ai_response = gemini_service.get_chat_response(
+            text, context.recent, summary=context.summary, voice=True, deadline=deadline
+        )
         
-        # Save AI response
-        ai_chat = ChatHistory(session_id=session_id, message=ai_response, is_user=False)
-        db.session.add(ai_chat)
-        db.session.commit()
+        # Save both messages
+        reply_key = history_writer.add_exchange(session_id, text, ai_response, user_timestamp=received_at)
+        conversation_memory.record(session_id, text, ai_response, reply_key)
         
-        # TTS
-        tts_service = TTSService()
-        audio_data = tts_service.text_to_speech(ai_response)
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        return jsonify({
+        # TTS: cached on disk and served by URL. Binary formats carry the raw audio;
+        # JSON inlines it as base64 unless the client opts out (or there is no URL to offer)
+        tts_service = default_tts_service
+        digest = tts_service.cached_speech(ai_response)
+        result = {
             'response': ai_response,
-            'audio': audio_base64,
+            'audio_url': url_for('voice.get_audio', digest=digest) if digest else None,
             'session_id': session_id
-        })
+        }
+        mimetype = request.accept_mimetypes.best_match(VOICE_RESPONSE_MIMETYPES, default='application/json')
+        if mimetype != 'application/json':
+            response = _binary_voice_response(mimetype, result, *_open_audio(digest, tts_service, ai_response))
+        else:
+            if data.get('inline_audio', True) or not digest:
+                audio_data = audio_cache.read(digest) if digest else None
+                if audio_data is None:
+                    audio_data = tts_service.text_to_speech(ai_response)
+                result['audio'] = base64.b64encode(audio_data).decode('utf-8')
+            response = jsonify(result)
+        response.vary.add('Accept')
+        return response
     
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@voice_bp.route('/process/stream', methods=['POST'])
+def process_voice_stream():
+    """
+    Pipelined voice reply as Server-Sent Events.
+
+    The reply is split into sentences while Gemini generates it and each
+    sentence is synthesized as soon as it is complete, several at a time.
+    Sends `start`, then one `segment` event per sentence in order (its
+    `text`, `audio_url`, and base64 `audio` unless `inline_audio` is false),
+    then `done` with the full reply. The client can play each segment as it
+    arrives instead of waiting for the whole reply and all of its audio.
+    """
+    data = request.get_json(silent=True) or {}
+    text = (data.get('text') or '').strip()
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+    inline_audio = data.get('inline_audio', True)
+
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    session_id = session['session_id']
+
+    received_at = datetime.utcnow()
+    context = conversation_memory.context(session_id)
+    tts_service = default_tts_service
+    deadline = Deadline(Config.VOICE_DEADLINE_SECONDS)
+
+    def generate():
+        parts = []
+        completed = False
+        started = time.monotonic()
+
+        def pieces():
+            for piece in gemini_service.get_chat_response_stream(
+                text, context.recent, summary=context.summary, voice=True, deadline=deadline
+            ):
+                parts.append(piece)
+                yield piece
+
+        try:
+            yield _sse_event('start', {'session_id': session_id})
+            with closing(voice_pipeline.segments(pieces(), tts_service)) as segments:
+                for index, (sentence, digest, audio) in enumerate(segments):
+                    if index == 0:
+                        logging.info(f"Voice stream first segment after {time.monotonic() - started:.2f}s")
+                    segment = {
+                        'index': index,
+                        'text': sentence,
+                        'audio_url': url_for('voice.get_audio', digest=digest) if digest else None,
+                    }
+                    if inline_audio or not digest:
+                        if audio is None:
+                            audio = audio_cache.read(digest) or b''
+                        if audio:
+                            segment['audio'] = base64.b64encode(audio).decode('utf-8')
+                    yield _sse_event('segment', segment)
+            completed = True
+            yield _sse_event('done', {'response': ''.join(parts).strip(), 'session_id': session_id})
+        except StreamInterrupted as e:
+            yield _sse_event('error', {'error': str(e), 'session_id': session_id})
+        finally:
+            # As in the chat stream: only a finished reply is stored, the
+            # user's message always is
+            try:
+                if completed:
+                    ai_response = ''.join(parts).strip()
+                    reply_key = history_writer.add_exchange(session_id, text, ai_response, user_timestamp=received_at)
+                    conversation_memory.record(session_id, text, ai_response, reply_key)
+                else:
+                    logging.info(f"Voice stream for session {session_id} ended before completion")
+                    history_writer.add_rows([{
+                        'session_id': session_id, 'message': text, 'is_user': True, 'timestamp': received_at,
+                    }])
+            except Exception as e:
+                logging.error(f"Failed to persist streamed voice reply: {e}")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@voice_bp.route('/speak', methods=['GET', 'POST'])
+def speak():
+    """
+    Stream speech for `text` as chunked audio/mpeg while it is synthesized.
+
+    GET takes `text` (and optionally `voice`) as query parameters, so the URL
+    can be used directly as an <audio> source; POST takes the same as JSON.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    text = (data.get('text') or '').strip()
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+
+    tts_service = default_tts_service
+    if data.get('voice'):
+        tts_service = TTSService()
+        tts_service.set_voice(data['voice'])
+
+    digest = tts_service.cache_key(text)
+    if audio_cache.get(digest):
+        return get_audio(digest)
+
+    return Response(
+        stream_with_context(tts_service.stream_speech(text)),
+        mimetype='audio/mpeg',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'},
+    )
+
+@voice_bp.route('/audio/<digest>', methods=['GET'])
+def get_audio(digest):
+    """Serve cached speech by its content digest, with ETag and Range support"""
+    if not audio_cache.is_digest(digest):
+        return jsonify({'error': 'Audio not found'}), 404
+    path = audio_cache.get(digest)
+    if path is None:
+        return jsonify({'error': 'Audio not found'}), 404
+    try:
+        # Content-addressed, so the URL's content never changes
+        response = send_file(path, mimetype='audio/mpeg', conditional=True, etag=digest, max_age=31536000)
+    except FileNotFoundError:
+        return jsonify({'error': 'Audio not found'}), 404
+    response.cache_control.immutable = True
+    return response
+
+@voice_bp.route('/voices', methods=['GET'])
+def list_voices():
+    """Available TTS voices, optionally filtered by `locale` (e.g. en-US) and `gender`"""
+    try:
+        voices = default_tts_service.get_available_voices(
+            locale=request.args.get('locale'), gender=request.args.get('gender')
+        )
+        return jsonify({'voices': voices})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,34 +1,101 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
+from app.config import Config
 from app.services.wakeword_local import WakeWordDetector
+from app.utils.pcm import MAX_SAMPLE_RATE, MIN_SAMPLE_RATE, float32_to_int16, to_int16_pcm
 import numpy as np
+import json
 import logging
+import uuid
 
 wakeword_bp = Blueprint('wakeword', __name__, url_prefix='/api/wakeword')
 
 # Initialize the detector globally
 try:
-    wake_word_detector = WakeWordDetector()
+    wake_word_detector = WakeWordDetector(
+        client_idle_timeout=Config.WAKEWORD_HTTP_IDLE_TIMEOUT,
+        max_clients=Config.WAKEWORD_HTTP_MAX_CLIENTS,
+    )
 except Exception as e:
     logging.error(f"Failed to initialize WakeWordDetector: {e}")
     wake_word_detector = None
 
-@wakeword_bp.route('/api/detect', methods=['POST'], endpoint="wakeword_detect")
+MAX_PCM_BYTES = 1024 * 1024  # About 16 s of 16 kHz float32 audio
+
+def _read_body(limit=MAX_PCM_BYTES):
+    """
+    The request body read straight into a writable buffer (for in-place
+    conversion), but never more than `limit` + 1 bytes of it, so an
+    oversized body is caught even when it is chunked and has no
+    Content-Length.
+    """
+    size = limit + 1 if request.content_length is None else min(request.content_length, limit + 1)
+    body = bytearray(size)
+    view = memoryview(body)
+    received = 0
+    while received < size:
+        count = request.stream.readinto(view[received:])
+        if not count:
+            break
+        received += count
+    view.release()
+    return body if received == size else body[:received]
+
+def _pcm_from_request(body):
+    """
+    (16-bit PCM bytes, sample rate) from the request `body` (a bytearray).
+
+    application/octet-stream bodies are raw little-endian PCM in the
+    format given by X-Sample-Format (int16, the default, or float32) at
+    the rate given by X-Sample-Rate (default 16000). Otherwise the body is
+    the legacy JSON {"audio_data": [floats]} at 16 kHz. Raises ValueError
+    if the audio is missing or malformed.
+    """
+    if request.mimetype == 'application/octet-stream':
+        sample_format = request.headers.get('X-Sample-Format', 'int16').lower()
+        try:
+            sample_rate = int(request.headers.get('X-Sample-Rate', WakeWordDetector.SAMPLE_RATE))
+        except ValueError:
+            raise ValueError('X-Sample-Rate must be an integer')
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f'X-Sample-Rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}')
+        if not body:
+            raise ValueError('Audio data is required')
+        # Float32 is converted in place in the writable body
+        return to_int16_pcm(body, sample_format), sample_rate
+
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    audio_data_list = data.get('audio_data') if isinstance(data, dict) else None
+    if not audio_data_list:
+        raise ValueError('Audio data is required')
+    return float32_to_int16(np.array(audio_data_list, dtype=np.float32)), WakeWordDetector.SAMPLE_RATE
+
+@wakeword_bp.route('/detect', methods=['POST'], endpoint="wakeword_detect")
+@wakeword_bp.route('/api/detect', methods=['POST'], endpoint="wakeword_detect_legacy")  # Older clients
 def detect_wake_word():
     if not wake_word_detector:
         return jsonify({'error': 'Wake word detector not initialized'}), 500
+    too_large = jsonify({'error': f'Audio data is limited to {MAX_PCM_BYTES} bytes per request'}), 413
+    if request.content_length is not None and request.content_length > MAX_PCM_BYTES:
+        return too_large
+    body = _read_body()
+    if len(body) > MAX_PCM_BYTES:
+        return too_large
 
     try:
-        data = request.get_json()
-        audio_data_list = data.get('audio_data')
+        audio_bytes, sample_rate = _pcm_from_request(body)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        if not audio_data_list:
-            return jsonify({'error': 'Audio data is required'}), 400
+    # Consecutive buffers from one browser session share a recognizer
+    if "session_id" not in session:
+        session["session_id"] = str(uuid.uuid4())
 
-        audio_array = np.array(audio_data_list, dtype=np.float32)
-        audio_bytes = (audio_array * 32767).astype(np.int16).tobytes()
-
-        is_detected = wake_word_detector.detect(audio_bytes)
-        return jsonify({'wake_word_detected': is_detected, 'confidence': wake_word_detector.get_last_confidence()})
+    try:
+        is_detected = wake_word_detector.detect(audio_bytes, sample_rate, client_id=session["session_id"])
+        return jsonify({'wake_word_detected': is_detected, 'confidence': 1.0 if is_detected else 0.0})
     except Exception as e:
         logging.error(f"Error in /api/wakeword/detect: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
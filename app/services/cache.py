@@ -1,42 +1,285 @@
-from functools import lru_cache
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from threading import RLock, local
+from app.config import Config
+import hashlib
 import logging
+import os
+import sqlite3
+import sys
+import time
+
+# Rough per-entry cost of the key digest, the tuple and the OrderedDict node
+_ENTRY_OVERHEAD = 200
 
 class ResponseCache:
-    """Simple cache for API responses with time-based expiration"""
-    
-    def __init__(self, max_size=100, ttl_seconds=3600):
+    """
+    LRU cache for API responses with time-based expiration.
+
+    Keys are hashed to a 16-byte digest, so long prompts are not kept in
+    memory twice. Entries are bounded both by count (`max_size`) and by an
+    approximate memory budget (`max_bytes`); the least recently used entry
+    is evicted first. All operations are O(1) and thread-safe.
+    """
+
+    def __init__(self, max_size=100, ttl_seconds=3600, max_bytes=16 * 1024 * 1024):
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
-        self.cache = {}
-    
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # digest -> (response, expires_at, size)
+        self._bytes = 0
+        self.lock = RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(key):
+        """Hash a cache key (usually the full prompt) to a compact digest"""
+        if isinstance(key, bytes):
+            return key
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _remove(self, digest):
+        _, _, size = self._entries.pop(digest)
+        self._bytes -= size
+
     def get(self, key):
         """Get a cached response if it exists and hasn't expired"""
-        if key in self.cache:
-            item = self.cache[key]
-            if datetime.now() - item['timestamp'] < timedelta(seconds=self.ttl_seconds):
-                logging.info("Cache hit")
-                return item['response']
-            else:
-                logging.info("Cache expired")
-                del self.cache[key]
-        return None
-    
+        digest = self.make_key(key)
+        with self.lock:
+            item = self._entries.get(digest)
+            if item is None:
+                self.misses += 1
+                return None
+
+            response, expires_at, _ = item
+            if time.monotonic() >= expires_at:
+                self._remove(digest)
+                self.expirations += 1
+                self.misses += 1
+                logging.debug("Cache expired")
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            logging.debug("Cache hit")
+            return response
+
     def set(self, key, response):
-        """Cache a response with timestamp"""
-        if len(self.cache) >= self.max_size:
-            # Remove oldest item
-            oldest = min(self.cache.items(), key=lambda x: x[1]['timestamp'])
-            del self.cache[oldest[0]]
-        
-        self.cache[key] = {
-            'response': response,
-            'timestamp': datetime.now()
-        }
-    
+        """Cache a response, evicting least recently used entries as needed"""
+        digest = self.make_key(key)
+        size = sys.getsizeof(response) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if digest in self._entries:
+                self._remove(digest)
+
+            while self._entries and (
+                len(self._entries) >= self.max_size or self._bytes + size > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+            self._entries[digest] = (response, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+
     def clear(self):
         """Clear all cached responses"""
-        self.cache.clear()
+        with self.lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_size": self.max_size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+class SharedResponseCache:
+    """
+    SQLite-backed response cache shared by all worker processes on a node.
+
+    The database file survives restarts, so a freshly started worker does
+    not begin cold. Expiry uses wall-clock time because entries are shared
+    between processes. Each thread keeps its own connection and any SQLite
+    error is logged and treated as a miss, so the cache can never fail a
+    request.
+    """
+
+    PRUNE_EVERY = 500  # Writes between pruning passes
+
+    def __init__(self, path, ttl_seconds=86400, max_entries=100000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._local = local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key BLOB PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        """Return this thread's connection, opening one after fork if needed"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Get a cached response if it exists and hasn't expired"""
+        digest = ResponseCache.make_key(key)
+        try:
+            row = self._connect().execute(
+                "SELECT response, expires_at FROM response_cache WHERE key = ?", (digest,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Shared cache read failed: {e}")
+            return None
+
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, response):
+        """Store a response for every worker on this node"""
+        digest = ResponseCache.make_key(key)
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                (digest, response, time.time() + self.ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(conn)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logging.warning(f"Shared cache write failed: {e}")
+
+    def _prune(self, conn):
+        """Drop expired rows, then the oldest writes beyond max_entries"""
+        conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM response_cache WHERE rowid <= ("
+            " SELECT rowid FROM response_cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        """Clear all cached responses for every worker"""
+        try:
+            self._connect().execute("DELETE FROM response_cache")
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache clear failed: {e}")
+
+    def stats(self):
+        """Return this process's hit/miss counters for the shared tier"""
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+class TieredResponseCache:
+    """
+    Two-level cache: the in-process ResponseCache (L1) in front of the
+    node-wide SharedResponseCache (L2). L2 hits are copied into L1.
+    """
+
+    def __init__(self, l1, l2=None):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key):
+        digest = ResponseCache.make_key(key)
+        response = self.l1.get(digest)
+        if response is not None or self.l2 is None:
+            return response
+
+        response = self.l2.get(digest)
+        if response is not None:
+            self.l1.set(digest, response)
+        return response
+
+    def set(self, key, response):
+        digest = ResponseCache.make_key(key)
+        self.l1.set(digest, response)
+        if self.l2 is not None:
+            self.l2.set(digest, response)
+
+    def clear(self):
+        self.l1.clear()
+        if self.l2 is not None:
+            self.l2.clear()
+
+    def stats(self):
+        stats = self.l1.stats()
+        if self.l2 is not None:
+            stats["shared"] = self.l2.stats()
+        return stats
+
+    def __len__(self):
+        return len(self.l1)
+
+def _create_shared_cache():
+    if not Config.SHARED_CACHE_PATH:
+        return None
+    try:
+        return SharedResponseCache(
+            Config.SHARED_CACHE_PATH,
+            ttl_seconds=Config.SHARED_CACHE_TTL,
+            max_entries=Config.SHARED_CACHE_MAX_ENTRIES,
+        )
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Shared response cache disabled: {e}")
+        return None
 
 # Create a global cache instance
-response_cache = ResponseCache()
\ No newline at end of file
+response_cache = TieredResponseCache(
+    ResponseCache(
+        max_size=Config.RESPONSE_CACHE_MAX_SIZE,
+        ttl_seconds=Config.RESPONSE_CACHE_TTL,
+        max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+    ),
+    _create_shared_cache(),
+)
@@ -0,0 +1,228 @@
+from collections import OrderedDict, deque
+from threading import Lock
+from app.config import Config
+import logging
+import re
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+def _clip(text: str, limit: int) -> str:
+    """First sentence of `text`, cut to at most `limit` characters"""
+    text = " ".join(text.split())
+    first = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    if len(first) > limit:
+        first = first[:limit - 3].rstrip() + "..."
+    return first
+
+class ConversationContext:
+    """Snapshot of a session's context, ready to be rendered into a prompt"""
+
+    def __init__(self, summary, recent):
+        self.summary = summary  # Condensed older turns, one line each
+        self.recent = recent  # [{'is_user': bool, 'message': str}, ...] oldest first
+
+    def __bool__(self):
+        return bool(self.summary or self.recent)
+
+class _SessionState:
+    def __init__(self):
+        self.summary_lines = deque()
+        self.summary_tokens = 0
+        self.recent = deque()  # (is_user, message, tokens)
+        self.recent_tokens = 0
+        self.last_key = None  # (timestamp, id) of the newest turn included
+
+class ConversationMemory:
+    """
+    Rolling per-session context with a bounded token budget.
+
+    The last few turns are kept verbatim. When they exceed `recent_turns`
+    or `recent_token_budget`, the oldest turn is folded into a one-line
+    summary entry; summary entries are dropped oldest-first once they
+    exceed `summary_token_budget`. Each update is O(1) in the length of
+    the conversation, so prompt size stays flat however long it grows.
+
+    State lives in-process in an LRU of `max_sessions`. On a miss, or
+    when the session's newest message is not the last one this state
+    includes (another worker answered it meanwhile), the session is
+    rebuilt newest turn first, from the session buffer and then older
+    ChatHistory pages, until both budgets are full. The result is the same
+    summary and recent turns the rolling updates would have produced.
+    """
+
+    def __init__(self, max_sessions=1000, recent_turns=6, recent_token_budget=1200,
+                 summary_token_budget=400, load_page_rows=100):
+        self.max_sessions = max_sessions
+        self.recent_turns = recent_turns
+        self.recent_token_budget = recent_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.load_page_rows = load_page_rows
+
+        self._sessions = OrderedDict()
+        self.lock = Lock()
+
+    @staticmethod
+    def _summary_line(is_user, message):
+        if is_user:
+            return f"User asked: {_clip(message, 160)}"
+        return f"Yara answered: {_clip(message, 100)}"
+
+    def _fold(self, state):
+        """Move the oldest verbatim turn into the summary"""
+        is_user, message, tokens = state.recent.popleft()
+        state.recent_tokens -= tokens
+
+        line = self._summary_line(is_user, message)
+        line_tokens = estimate_tokens(line)
+        state.summary_lines.append((line, line_tokens))
+        state.summary_tokens += line_tokens
+
+        while state.summary_tokens > self.summary_token_budget and state.summary_lines:
+            _, dropped = state.summary_lines.popleft()
+            state.summary_tokens -= dropped
+
+    def _append(self, state, is_user, message):
+        tokens = estimate_tokens(message)
+        state.recent.append((is_user, message, tokens))
+        state.recent_tokens += tokens
+        while len(state.recent) > 1 and (
+            len(state.recent) > self.recent_turns or state.recent_tokens > self.recent_token_budget
+        ):
+            self._fold(state)
+
+    def _turns_newest_first(self, session_id):
+        """The session's turns, newest first: the buffered ones, then older ChatHistory pages"""
+        from app.models.chat_history import ChatHistory
+        from app.services.session_buffer import session_buffer
+        from app.database import db
+
+        turns, complete = session_buffer.recent(session_id)
+        yield from reversed(turns)
+        if complete:
+            return
+
+        key = db.tuple_(ChatHistory.timestamp, ChatHistory.id)
+        before = (turns[0].timestamp, turns[0].id) if turns else None
+        while True:
+            query = (
+                db.select(ChatHistory.id, ChatHistory.message, ChatHistory.is_user, ChatHistory.timestamp)
+                .where(ChatHistory.session_id == session_id)
+                .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+                .limit(self.load_page_rows)
+            )
+            if before is not None:
+                query = query.where(key < before)
+            rows = db.session.execute(query).all()
+            yield from rows
+            if len(rows) < self.load_page_rows:
+                return
+            before = (rows[-1].timestamp, rows[-1].id)
+
+    def _load(self, session_id):
+        """
+        Rebuild a session's state from its history. Walking back from the
+        newest turn, turns are kept verbatim while they fit the recent
+        limits, then summarized while the lines fit the summary budget;
+        this is what _append() and _fold() leave after the same turns.
+        """
+        state = _SessionState()
+        recent = []  # Newest first
+        summary = []
+        try:
+            for turn in self._turns_newest_first(session_id):
+                if state.last_key is None:
+                    state.last_key = (turn.timestamp, str(turn.id))
+                tokens = estimate_tokens(turn.message)
+                if not summary and (not recent or (
+                    len(recent) < self.recent_turns and state.recent_tokens + tokens <= self.recent_token_budget
+                )):
+                    recent.append((turn.is_user, turn.message, tokens))
+                    state.recent_tokens += tokens
+                    continue
+                line = self._summary_line(turn.is_user, turn.message)
+                line_tokens = estimate_tokens(line)
+                if state.summary_tokens + line_tokens > self.summary_token_budget:
+                    break
+                summary.append((line, line_tokens))
+                state.summary_tokens += line_tokens
+        except Exception as e:
+            logging.error(f"Failed to load conversation for session {session_id}: {e}")
+            return _SessionState()
+
+        state.recent.extend(reversed(recent))
+        state.summary_lines.extend(reversed(summary))
+        return state
+
+    def _latest_key(self, session_id):
+        """(timestamp, id) of the session's newest message, checked against the database"""
+        from app.services.session_buffer import session_buffer
+
+        try:
+            turns, _ = session_buffer.recent(session_id, 1)
+        except Exception as e:
+            logging.error(f"Failed to check conversation for session {session_id}: {e}")
+            return None
+        return (turns[-1].timestamp, str(turns[-1].id)) if turns else None
+
+    def _state(self, session_id):
+        with self.lock:
+            state = self._sessions.get(session_id)
+            last_key = state.last_key if state is not None else None
+        if state is not None:
+            if self._latest_key(session_id) == last_key:
+                with self.lock:
+                    if session_id in self._sessions:
+                        self._sessions.move_to_end(session_id)
+                return state
+            with self.lock:
+                if self._sessions.get(session_id) is state:
+                    del self._sessions[session_id]
+
+        state = self._load(session_id)
+        with self.lock:
+            # Another thread may have loaded the session meanwhile; keep theirs
+            state = self._sessions.setdefault(session_id, state)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return state
+
+    def context(self, session_id) -> ConversationContext:
+        """Return the context to send along with the session's next message"""
+        state = self._state(session_id)
+        with self.lock:
+            return ConversationContext(
+                "\n".join(line for line, _ in state.summary_lines),
+                [{"is_user": is_user, "message": message} for is_user, message, _ in state.recent],
+            )
+
+    def record(self, session_id, user_message, ai_response, reply_key=None):
+        """
+        Add a completed exchange to the session's context. `reply_key` is
+        the (timestamp, id) of the stored reply (HistoryWriter.add_exchange);
+        without it the next context() call rebuilds the session.
+        """
+        with self.lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                # Not in memory: the next context() call loads these rows from the database
+                return
+            self._append(state, True, user_message)
+            self._append(state, False, ai_response)
+            state.last_key = (reply_key[0], str(reply_key[1])) if reply_key else None
+
+    def forget(self, session_id):
+        with self.lock:
+            self._sessions.pop(session_id, None)
+
+# Global memory shared by the chat and voice routes
+conversation_memory = ConversationMemory(
+    max_sessions=Config.CONVERSATION_MAX_SESSIONS,
+    recent_turns=Config.CONVERSATION_RECENT_TURNS,
+    recent_token_budget=Config.CONVERSATION_RECENT_TOKENS,
+    summary_token_budget=Config.CONVERSATION_SUMMARY_TOKENS,
+)
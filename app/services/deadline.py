@@ -0,0 +1,129 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from app.config import Config
+import logging
+import time
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of time before upstream answers"""
+
+class Deadline:
+    """Point in (monotonic) time by which a request must be answered"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:.1f}s exceeded")
+
+# Upstream calls run here so the request thread can stop waiting for them
+_executor = ThreadPoolExecutor(max_workers=Config.UPSTREAM_THREADS, thread_name_prefix="upstream")
+
+hedge_stats = {"hedged": 0, "hedge_wins": 0, "abandoned": 0}
+_stats_lock = Lock()
+
+def _count(name):
+    with _stats_lock:
+        hedge_stats[name] += 1
+
+def hedge_counts():
+    """A consistent copy of hedge_stats"""
+    with _stats_lock:
+        return dict(hedge_stats)
+
+def _submit(func, on_done):
+    """Submit func() to the upstream pool; on_done(future, seconds since submission) runs when it ends"""
+    submitted = time.monotonic()
+    future = _executor.submit(func)
+    if on_done is not None:
+        future.add_done_callback(lambda f: on_done(f, time.monotonic() - submitted))
+    return future
+
+def _discard_result(future, discard):
+    """Pass the result of a call nobody waits for any more to discard(), once it succeeds"""
+    if not future.cancelled() and future.exception() is None:
+        discard(future.result())
+
+def run_with_deadline(func, deadline=None, hedge_after=None, can_hedge=None, on_done=None, discard=None):
+    """
+    Run func() on the upstream pool and wait at most until `deadline`.
+
+    If `hedge_after` seconds pass without an answer, and `can_hedge()`
+    allows it, a second identical call is started and whichever succeeds
+    first is returned. Calls still running when the deadline passes are
+    abandoned: their results are ignored and they are left to finish (or
+    time out) on their own.
+
+    `on_done(future, seconds)` is called for every call started here when
+    it really finishes (or is cancelled before it ran), even after the
+    caller stopped waiting for it, so resources held per call can be
+    released then. `discard(result)` receives the result of every
+    successful call other than the one returned (an abandoned call or the
+    losing hedge), e.g. to close it.
+    """
+    if deadline is not None:
+        deadline.check()
+
+    futures = [_submit(func, on_done)]
+    winner = None
+    try:
+        if hedge_after is not None and (deadline is None or hedge_after < deadline.remaining()):
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done and (can_hedge is None or can_hedge()):
+                futures.append(_submit(func, on_done))
+                _count("hedged")
+                logging.debug(f"Hedging upstream call after {hedge_after:.2f}s")
+
+        error = None
+        pending = set(futures)
+        while pending:
+            timeout = deadline.remaining() if deadline is not None else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                _count("abandoned")
+                raise DeadlineExceeded(f"Upstream call abandoned after {deadline.seconds:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and future is futures[1]:
+                        _count("hedge_wins")
+                    winner = future
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for future in futures:
+            if future is not winner and not future.cancel() and discard is not None:
+                future.add_done_callback(lambda f: _discard_result(f, discard))
+
+_END = object()
+
+def iterate_with_deadline(iterable, deadline):
+    """
+    Yield the items of `iterable` (e.g. a streamed upstream response),
+    waiting at most until `deadline` for each one.
+
+    Every next() runs on the upstream pool, so a stalled stream cannot hold
+    the request past its deadline: DeadlineExceeded is raised instead and
+    the pending read is abandoned like an expired run_with_deadline call.
+    """
+    iterator = iter(iterable)
+    while True:
+        deadline.check()
+        future = _executor.submit(next, iterator, _END)
+        done, _ = wait([future], timeout=deadline.remaining())
+        if not done:
+            future.cancel()
+            _count("abandoned")
+            raise DeadlineExceeded(f"Upstream stream abandoned after {deadline.seconds:.1f}s")
+        item = future.result()
+        if item is _END:
+            return
+        yield item
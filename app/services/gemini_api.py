@@ -1,14 +1,26 @@
 import google.generativeai as genai
 import logging
+import time
 from .sync_rate_limiter import SyncRateLimiter
 from .cache import response_cache
+from .query_cache import normalize_query, query_index
+from .singleflight import SingleFlight
+from .model_router import ModelRouter, ModelTier
+from .deadline import DeadlineExceeded, hedge_counts, iterate_with_deadline, run_with_deadline
+from .upstream_health import HeldStream, QuotaExceeded, UpstreamUnavailable, is_quota_error, upstream_health
 from app.config import Config  # Import API key from config
 
+class StreamInterrupted(Exception):
+    """A streamed reply broke off partway; what was sent so far is incomplete"""
+
 class GeminiServiceSingleton:
     def __init__(self):
         self.api_key = Config.GOOGLE_API_KEY
         self.enabled = bool(self.api_key)
 
+        # Identical prompts that are in flight at the same time share one upstream call
+        self.inflight = SingleFlight()
+
         if not self.enabled:
             logging.warning("GOOGLE_API_KEY is not set. GeminiService will be disabled.")
             return
@@ -16,7 +28,15 @@ class GeminiServiceSingleton:
         # Initialize rate limiter (60 requests per minute, burst 10)
         self.rate_limiter = SyncRateLimiter(rate_limit=60, per_seconds=60, burst_limit=10)
 
+        # Route each request to a model tier by cost and observed latency
+        self.router = ModelRouter([
+            ModelTier("primary", Config.GEMINI_PRIMARY_MODEL, Config.GEMINI_PRIMARY_SLO_MS / 1000),
+            ModelTier("fast", Config.GEMINI_FAST_MODEL, Config.GEMINI_FAST_SLO_MS / 1000),
+        ])
+        self.models = {}
+
         self.model = None
+        self.model_name = None
         self._initialize_model()
 
         self.system_prompt = """You are Yara, a friendly and helpful AI voice assistant.
@@ -30,9 +50,11 @@ class GeminiServiceSingleton:
             genai.configure(api_key=self.api_key)
 
             # Primary model - choose a valid one
-            model_name = "models/gemini-2.5-pro"
+            model_name = Config.GEMINI_PRIMARY_MODEL
             try:
                 self.model = genai.GenerativeModel(model_name)
+                self.model_name = model_name
+                self.models[model_name] = self.model
                 logging.info(f"Successfully initialized Gemini model: {model_name}")
                 return
             except Exception as model_error:
@@ -47,6 +69,8 @@ class GeminiServiceSingleton:
             for alt_model in alternative_models:
                 try:
                     self.model = genai.GenerativeModel(alt_model)
+                    self.model_name = alt_model
+                    self.models[alt_model] = self.model
                     logging.info(f"Successfully initialized alternative model: {alt_model}")
                     return
                 except Exception as e:
@@ -64,78 +88,316 @@ class GeminiServiceSingleton:
         if not self.model:
             raise Exception("The AI model is not initialized.")
 
-    def _generate_content_sync(self, prompt: str):
+    def _get_model(self, model_name: str):
+        """Return the model client for `model_name`, falling back to the default model"""
+        model = self.models.get(model_name)
+        if model is None:
+            try:
+                model = genai.GenerativeModel(model_name)
+            except Exception as e:
+                logging.warning(f"Failed to initialize {model_name}, using {self.model_name}: {e}")
+                model = self.model
+            self.models[model_name] = model
+        return model
+
+    def _hedge_delay(self, model_name: str):
+        """Seconds to wait before hedging a call to `model_name`, or None"""
+        if not Config.GEMINI_HEDGE_ENABLED:
+            return None
+        if Config.GEMINI_HEDGE_AFTER_MS:
+            return Config.GEMINI_HEDGE_AFTER_MS / 1000
+        return self.router.latency_percentile(model_name, 95)
+
+    def _call_model(self, model, prompt: str, deadline, hedge_after, **kwargs):
+        """
+        One upstream attempt, admitted by upstream_health and bounded by the
+        deadline. Every call holds an upstream_health slot until it really
+        ends, also when the request stopped waiting for it at the deadline:
+        the slot is released when the call's future completes. A streamed
+        response comes back as a HeldStream, which keeps the slot until the
+        stream ends.
+        """
+        if deadline is not None:
+            kwargs["request_options"] = {"timeout": max(deadline.remaining(), 1.0)}
+        stream = kwargs.get("stream", False)
+
+        def call():
+            start = time.monotonic()
+            response = model.generate_content(prompt, **kwargs)
+            return HeldStream(upstream_health, response, start) if stream else response
+
+        def finished(future, latency):
+            if future.cancelled():
+                upstream_health.cancel()
+            elif future.exception() is not None:
+                upstream_health.release(latency, future.exception())
+            elif not stream:
+                upstream_health.release(latency)
+
+        def can_hedge():
+            # A hedge is an extra call: it needs a rate limit token and a slot of its own
+            return self.rate_limiter.acquire(timeout=0) and upstream_health.try_acquire()
+
+        upstream_health.acquire()
+        return run_with_deadline(
+            call,
+            deadline=deadline,
+            hedge_after=hedge_after,
+            can_hedge=can_hedge,
+            on_done=finished,
+            discard=lambda response: response.close() if stream else None,
+        )
+
+    def _generate_content_sync(self, prompt: str, model_name: str = None, deadline=None, **kwargs):
+        """
+        Call Gemini with rate limiting, optionally bounded by `deadline`.
+
+        The call runs on the upstream thread pool; once the deadline passes
+        the request stops waiting for it (DeadlineExceeded). Non-streaming
+        calls may be hedged with a second request (GEMINI_HEDGE_ENABLED).
+        Raises UpstreamUnavailable (with retry_after) when throttled, shed or
+        while the circuit breaker is open.
+        """
         self._check_api_availability()
+        model_name = model_name or self.model_name
+        model = self._get_model(model_name)
+        hedge_after = None if kwargs.get("stream") else self._hedge_delay(model_name)
+        start = time.monotonic()
         try:
-            response = self.rate_limiter.execute(self.model.generate_content, prompt)
-            return response
+            response = self.rate_limiter.execute(
+                self._call_model, model, prompt, deadline, hedge_after, deadline=deadline, **kwargs
+            )
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
-            if "quota exceeded" in str(e).lower():
-                raise Exception("Free tier quota exceeded.")
+            quota = is_quota_error(e)
+            self.router.record(model_name, time.monotonic() - start, failed=True, quota=quota)
+            if quota:
+                raise QuotaExceeded("Free tier quota exceeded.", upstream_health.retry_after()) from e
             raise
+        self.router.record(model_name, time.monotonic() - start)
+        return response
+
+    def _build_prompt(self, message: str) -> str:
+        return f"{self.system_prompt}\n\nUser: {message}\nYara:"
+
+    def _cached_reply(self, message: str):
+        """
+        Look up a context-free reply by its normalized text, falling back to
+        the answer for a near-identical earlier question.
+        """
+        normalized = normalize_query(message)
+        cached_response = response_cache.get(self._build_prompt(normalized))
+        if cached_response is None:
+            similar = query_index.lookup(normalized)
+            if similar:
+                cached_response = response_cache.get(self._build_prompt(similar))
+        return cached_response
+
+    def _remember_reply(self, message: str, response_text: str):
+        normalized = normalize_query(message)
+        response_cache.set(self._build_prompt(normalized), response_text)
+        query_index.add(normalized)
+
+    def _generate_and_cache(self, message: str, prompt: str, model_name: str, deadline=None) -> str:
+        response = self._generate_content_sync(prompt, model_name, deadline)
+        response_text = response.text.strip()
+        self._remember_reply(message, response_text)
+        return response_text
+
+    def _error_reply(self, e: Exception) -> str:
+        error_msg = str(e).lower()
+        if isinstance(e, TimeoutError):
+            logging.warning(f"Gemini request timed out: {e}")
+            return "Sorry, that took too long to answer. Please try again."
+        elif isinstance(e, UpstreamUnavailable) or is_quota_error(e):
+            logging.warning(f"Gemini API quota exceeded: {e}")
+            return "I'm operating on a free tier with limited requests. Try again later."
+        elif "daily request limit" in error_msg:
+            logging.warning("Daily request limit reached")
+            return "I've reached my daily message limit. Try again tomorrow."
+        else:
+            logging.error(f"Gemini API error: {e}")
+            return "I'm having trouble processing your request. Try again."
 
-    def generate_response(self, message: str) -> str:
+    def generate_response(self, message: str, voice: bool = False, deadline=None) -> str:
         if not self.enabled:
             return "The AI service is disabled. Set GOOGLE_API_KEY."
         try:
-            full_prompt = f"{self.system_prompt}\n\nUser: {message}\nYara:"
-
             # Check cache first
-            cached_response = response_cache.get(full_prompt)
+            cached_response = self._cached_reply(message)
             if cached_response:
                 return cached_response
 
-            response = self._generate_content_sync(full_prompt)
-            response_text = response.text.strip()
+            # Generate and cache, sharing the call with concurrent identical questions
+            full_prompt = self._build_prompt(message)
+            model_name = self.router.choose(message, voice=voice)
+            return self.inflight.do(
+                normalize_query(message), self._generate_and_cache, message, full_prompt, model_name, deadline,
+                timeout=deadline.remaining() if deadline else None,
+            )
+
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            return self._error_reply(e)
 
-            # Cache the response
-            response_cache.set(full_prompt, response_text)
-            return response_text
+    def _stream_reply(self, prompt: str, model_name: str, deadline=None):
+        """
+        Yield the pieces of the streamed reply to `prompt`, and return the
+        full text (None if an error reply was yielded instead).
 
+        If the stream fails or runs past `deadline` after part of the reply
+        was yielded, raises StreamInterrupted, so a truncated reply is never
+        taken for a complete one.
+        """
+        parts = []
+        response = None
+        error = None
+        try:
+            response = self._generate_content_sync(prompt, model_name, deadline, stream=True)
+            chunks = iterate_with_deadline(response, deadline) if deadline is not None else response
+            for chunk in chunks:
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    yield text
+        except GeneratorExit:
+            raise
         except Exception as e:
-            error_msg = str(e).lower()
-            if "quota exceeded" in error_msg:
-                logging.warning(f"Gemini API quota exceeded: {e}")
-                return "I'm operating on a free tier with limited requests. Try again later."
-            elif "daily request limit" in error_msg:
-                logging.warning("Daily request limit reached")
-                return "I've reached my daily message limit. Try again tomorrow."
-            else:
-                logging.error(f"Gemini API error: {e}")
-                return "I'm having trouble processing your request. Try again."
-
-    def get_chat_response(self, message: str, context: list = None) -> str:
+            error = e
+            if parts:
+                logging.error(f"Gemini stream interrupted: {e}")
+                if isinstance(e, DeadlineExceeded):
+                    raise StreamInterrupted("The reply took too long. Please try again.") from e
+                raise StreamInterrupted("The reply was interrupted. Please try again.") from e
+            yield self._error_reply(e)
+            return None
+        finally:
+            if response is not None:
+                # Frees the upstream slot, recording `error` (e.g. the deadline) as the outcome
+                response.close(error)
+        return "".join(parts).strip()
+
+    def generate_response_stream(self, message: str, voice: bool = False, deadline=None):
+        """
+        Yield the reply to `message` piece by piece as Gemini produces it.
+
+        The complete text is cached once the upstream stream is exhausted.
+        If the consumer stops early (e.g. the client disconnected) nothing
+        is cached, since the reply is incomplete. `deadline` bounds the
+        whole stream. Raises StreamInterrupted if upstream fails or runs out
+        of time partway through.
+        """
+        if not self.enabled:
+            yield "The AI service is disabled. Set GOOGLE_API_KEY."
+            return
+
+        cached_response = self._cached_reply(message)
+        if cached_response:
+            yield cached_response
+            return
+
+        full_prompt = self._build_prompt(message)
+        model_name = self.router.choose(message, voice=voice)
+        response_text = yield from self._stream_reply(full_prompt, model_name, deadline)
+        if response_text:
+            self._remember_reply(message, response_text)
+
+    def get_chat_response_stream(self, message: str, context: list = None, summary: str = None,
+                                 voice: bool = False, deadline=None):
+        """
+        Streaming counterpart of get_chat_response: yield the reply piece by
+        piece. A completed reply is cached like a non-streamed one. Raises
+        StreamInterrupted if upstream fails or `deadline` passes partway
+        through.
+        """
+        if not self.enabled:
+            yield "The AI service is disabled. Set GOOGLE_API_KEY."
+            return
+        if not context and not summary:
+            yield from self.generate_response_stream(message, voice=voice, deadline=deadline)
+            return
+
+        conversation = self._build_conversation(message, context, summary)
+        cached_response = response_cache.get(conversation)
+        if cached_response:
+            yield cached_response
+            return
+
+        model_name = self.router.choose(message, has_context=True, voice=voice)
+        response_text = yield from self._stream_reply(conversation, model_name, deadline)
+        if response_text:
+            response_cache.set(conversation, response_text)
+
+    def get_chat_response(self, message: str, context: list = None, summary: str = None,
+                          voice: bool = False, deadline=None) -> str:
+        """
+        Reply to `message` within an ongoing conversation.
+
+        `context` holds the recent turns verbatim ({'is_user', 'message'}
+        dicts, oldest first) and `summary` condenses everything older; both
+        come from ConversationMemory, which keeps them within a token budget.
+        Without either, this is a context-free question and goes through
+        generate_response and its caches. Voice turns prefer the fast model.
+        `deadline` (a Deadline) bounds the whole upstream wait.
+        """
         if not self.enabled:
             return "The AI service is disabled. Set GOOGLE_API_KEY."
+        if not context and not summary:
+            return self.generate_response(message, voice=voice, deadline=deadline)
         try:
-            conversation = f"{self.system_prompt}\n\nConversation history summary:"
-
-            if context:
-                if len(context) > 5:
-                    conversation += "\nEarlier messages: "
-                    conversation += ", ".join([
-                        f"{'User' if chat['is_user'] else 'Yara'} said: {chat['message'][:50]}..."
-                        for chat in context[:-5]
-                    ])
-                conversation += "\n\nRecent messages:\n"
-                for chat in context[-5:]:
-                    role = "User" if chat['is_user'] else "Yara"
-                    conversation += f"{role}: {chat['message']}\n"
-
-            conversation += f"User: {message}\nYara:"
+            conversation = self._build_conversation(message, context, summary)
 
             cached_response = response_cache.get(conversation)
             if cached_response:
                 return cached_response
 
-            response = self._generate_content_sync(conversation)
-            response_text = response.text.strip()
-            response_cache.set(conversation, response_text)
-            return response_text
+            model_name = self.router.choose(message, has_context=True, voice=voice)
+            return self.inflight.do(
+                conversation, self._generate_conversation, conversation, model_name, deadline,
+                timeout=deadline.remaining() if deadline else None,
+            )
 
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
+            if isinstance(e, TimeoutError):
+                return self._error_reply(e)
             logging.error(f"Gemini API error in get_chat_response: {e}")
             return "I'm having trouble processing your request right now. Try again."
 
+    def _build_conversation(self, message: str, context: list = None, summary: str = None) -> str:
+        conversation = self.system_prompt
+
+        if summary:
+            conversation += f"\n\nConversation summary:\n{summary}"
+        if context:
+            conversation += "\n\nRecent messages:\n"
+            for chat in context:
+                role = "User" if chat['is_user'] else "Yara"
+                conversation += f"{role}: {chat['message']}\n"
+        else:
+            conversation += "\n\n"
+
+        return conversation + f"User: {message}\nYara:"
+
+    def _generate_conversation(self, conversation: str, model_name: str, deadline=None) -> str:
+        response = self._generate_content_sync(conversation, model_name, deadline)
+        response_text = response.text.strip()
+        response_cache.set(conversation, response_text)
+        return response_text
+
+    def stats(self):
+        """Upstream call counters for monitoring"""
+        stats = {
+            "inflight": self.inflight.stats(),
+            "hedging": hedge_counts(),
+            "upstream": upstream_health.stats(),
+        }
+        if self.enabled:
+            stats["models"] = self.router.stats()
+        return stats
+
 # ---- Instantiate using Config ----
 gemini_service = GeminiServiceSingleton()
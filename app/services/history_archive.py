@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta
+from app.config import Config
+from app.database import db
+import gzip
+import json
+import logging
+import os
+import re
+
+_PARTITION_RE = re.compile(r"^chat_history_y(\d{4})m(\d{2})$")
+
+class HistoryArchiver:
+    """
+    Moves idle sessions out of chat_history into compressed archive files.
+
+    A session whose last message is older than `retention_days` is written
+    as one gzip member of NDJSON (one message per line) to
+    `archive_dir/YYYY-MM/chat_history-<run>.ndjson.gz`, grouped by the month
+    of its last message. Each compaction run appends to its own file, so
+    runs never contend for one. The member's byte range is recorded in
+    ChatHistoryArchive and the session's rows are deleted from the hot
+    table in the same transaction, so reading an archived session back is
+    one seek and one decompress.
+
+    On Postgres, where chat_history is partitioned by month, the job also
+    creates the upcoming month's partition and drops partitions that are
+    older than the retention window and have been emptied.
+    """
+
+    def __init__(self, archive_dir, retention_days=30, batch_sessions=500):
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.batch_sessions = batch_sessions
+
+    def _idle_sessions(self, cutoff, after=None):
+        """
+        The next batch of idle sessions in session_id order, after `after`.
+        Keyset pagination walks the (session_id, timestamp) index once over
+        the whole run instead of regrouping the table for every batch.
+        """
+        from app.models.chat_history import ChatHistory
+
+        query = db.select(ChatHistory.session_id)
+        if after is not None:
+            query = query.where(ChatHistory.session_id > after)
+        return db.session.execute(
+            query
+            .group_by(ChatHistory.session_id)
+            .having(db.func.max(ChatHistory.timestamp) < cutoff)
+            .order_by(ChatHistory.session_id)
+            .limit(self.batch_sessions)
+        ).scalars().all()
+
+    def _append(self, relative_path, payload):
+        """Append `payload` to an archive file and return the offset it starts at"""
+        path = os.path.join(self.archive_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return offset
+
+    def _archive_session(self, session_id, run_id):
+        """Archive one session's rows; the caller commits"""
+        from app.models.chat_history import ChatHistory
+        from app.models.chat_history_archive import ChatHistoryArchive
+
+        rows = db.session.execute(
+            db.select(ChatHistory.id, ChatHistory.message, ChatHistory.is_user, ChatHistory.timestamp)
+            .where(ChatHistory.session_id == session_id)
+            .order_by(ChatHistory.timestamp, ChatHistory.id)
+        ).all()
+        if not rows:
+            return 0
+
+        lines = "".join(
+            json.dumps({
+                "id": row.id,
+                "session_id": session_id,
+                "message": row.message,
+                "is_user": row.is_user,
+                "timestamp": row.timestamp.isoformat(),
+            }) + "\n"
+            for row in rows
+        )
+        payload = gzip.compress(lines.encode("utf-8"))
+        month = rows[-1].timestamp.strftime("%Y-%m")
+        relative_path = f"{month}/chat_history-{run_id}.ndjson.gz"
+        offset = self._append(relative_path, payload)
+
+        db.session.add(ChatHistoryArchive(
+            session_id=session_id,
+            month=month,
+            path=relative_path,
+            byte_offset=offset,
+            length=len(payload),
+            message_count=len(rows),
+            first_timestamp=rows[0].timestamp,
+            last_timestamp=rows[-1].timestamp,
+        ))
+        # Only the rows just archived; anything newer stays in the hot table
+        db.session.execute(db.delete(ChatHistory).where(ChatHistory.id.in_([row.id for row in rows])))
+        return len(rows)
+
+    def _maintain_partitions(self, now, cutoff):
+        """Create next month's partition and drop emptied ones past the cutoff (Postgres only)"""
+        next_month = (now.replace(day=1) + timedelta(days=32)).replace(day=1)
+        for month in (now.date().replace(day=1), next_month.date()):
+            db.session.execute(db.text("SELECT create_chat_history_partition(:month)"), {"month": month})
+
+        partitions = db.session.execute(db.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = 'chat_history'"
+        )).scalars().all()
+
+        dropped = []
+        for name in partitions:
+            match = _PARTITION_RE.match(name)
+            if not match:
+                continue
+            month_end = (datetime(int(match.group(1)), int(match.group(2)), 1) + timedelta(days=32)).replace(day=1)
+            if month_end > cutoff:
+                continue
+            if db.session.execute(db.text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')).scalar():
+                continue
+            db.session.execute(db.text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+        db.session.commit()
+        return dropped
+
+    def compact(self, now=None):
+        """
+        Archive every idle session; returns counts of what was moved.
+
+        This process's session buffer and conversation memory drop the
+        archived sessions. Other workers notice on their next read, when the
+        session's newest row no longer matches what they have cached.
+        """
+        from app.services.conversation import conversation_memory
+        from app.services.session_buffer import session_buffer
+
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.retention_days)
+        run_id = f"{now:%Y%m%dT%H%M%S}-{os.getpid()}"
+        sessions = messages = 0
+        last_session = None
+
+        while True:
+            batch = self._idle_sessions(cutoff, after=last_session)
+            if not batch:
+                break
+            for session_id in batch:
+                messages += self._archive_session(session_id, run_id)
+            db.session.commit()
+            for session_id in batch:
+                session_buffer.forget(session_id)
+                conversation_memory.forget(session_id)
+            last_session = batch[-1]
+            sessions += len(batch)
+            logging.info(f"Archived {sessions} sessions ({messages} messages) so far")
+
+        dropped = []
+        if db.engine.dialect.name == "postgresql":
+            dropped = self._maintain_partitions(now, cutoff)
+        return {"sessions": sessions, "messages": messages, "dropped_partitions": dropped}
+
+    def read_entry(self, entry):
+        """The messages of one ChatHistoryArchive entry, oldest first, as dicts"""
+        with open(os.path.join(self.archive_dir, entry.path), "rb") as f:
+            f.seek(entry.byte_offset)
+            payload = f.read(entry.length)
+        return [json.loads(line) for line in gzip.decompress(payload).decode("utf-8").splitlines()]
+
+    def read_session(self, session_id):
+        """All archived messages of a session, oldest first, as dicts"""
+        from app.models.chat_history_archive import ChatHistoryArchive
+
+        entries = (
+            ChatHistoryArchive.query
+            .filter_by(session_id=session_id)
+            .order_by(ChatHistoryArchive.first_timestamp)
+            .all()
+        )
+        messages = []
+        for entry in entries:
+            messages.extend(self.read_entry(entry))
+        return messages
+
+# Global archiver used by `flask compact-history` and the archived history endpoint
+history_archiver = HistoryArchiver(
+    archive_dir=Config.ARCHIVE_DIR,
+    retention_days=Config.ARCHIVE_RETENTION_DAYS,
+    batch_sessions=Config.ARCHIVE_BATCH_SESSIONS,
+)
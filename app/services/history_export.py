@@ -0,0 +1,172 @@
+from collections import namedtuple
+from datetime import datetime
+from app.database import db
+from app.utils.cursors import encode_cursor
+import gzip
+import heapq
+import json
+import logging
+import time
+
+_ArchivedRow = namedtuple("_ArchivedRow", "id session_id message is_user timestamp")
+
+def _order_key(row):
+    return row.timestamp, str(row.id)
+
+class HistoryExport:
+    """
+    One streaming export of chat history as gzip-compressed NDJSON.
+
+    Iterating yields compressed chunks. Rows come from a server-side cursor
+    (`yield_per` rows at a time) in (timestamp, id) order and are compressed
+    about `chunk_size` bytes of NDJSON at a time, so memory use does not
+    depend on how much is exported. Each chunk is a complete gzip member
+    (concatenated members are one valid gzip file), so output cut off after
+    any chunk decompresses cleanly. Every line carries the row's `cursor`.
+
+    With `include_archived` (the default), sessions that compaction moved
+    to the archive are exported too: their gzip members are read as the
+    export reaches their first message and merged into the same
+    (timestamp, id) order, so cursors and resuming work across both.
+
+    `rows` and `last_cursor` only count chunks the consumer has finished
+    with, i.e. came back for the next one after; passing `last_cursor` as
+    `after` resumes an interrupted export right after the last chunk it
+    wrote. `rows_per_second()` can be read while the export runs or after.
+    """
+
+    def __init__(self, start=None, end=None, after=None, session_id=None, include_archived=True,
+                 yield_per=1000, chunk_size=64 * 1024, report_every=50000):
+        self.start = start  # Inclusive datetime
+        self.end = end  # Exclusive datetime
+        self.after = after  # (timestamp, id) to resume after
+        self.session_id = session_id
+        self.include_archived = include_archived
+        self.yield_per = yield_per
+        self.chunk_size = chunk_size
+        self.report_every = report_every
+
+        self.rows = 0
+        self.last_cursor = None
+        self.started_at = None
+        self.finished_at = None
+
+    def _query(self):
+        from app.models.chat_history import ChatHistory
+
+        query = db.select(
+            ChatHistory.id, ChatHistory.session_id, ChatHistory.message, ChatHistory.is_user, ChatHistory.timestamp
+        )
+        if self.session_id:
+            query = query.where(ChatHistory.session_id == self.session_id)
+        if self.start:
+            query = query.where(ChatHistory.timestamp >= self.start)
+        if self.end:
+            query = query.where(ChatHistory.timestamp < self.end)
+        if self.after:
+            query = query.where(db.tuple_(ChatHistory.timestamp, ChatHistory.id) > self.after)
+        return (
+            query.order_by(ChatHistory.timestamp, ChatHistory.id)
+            .execution_options(stream_results=True, yield_per=self.yield_per)
+        )
+
+    def _archive_query(self):
+        """Archive entries that may hold rows in range, by their first message"""
+        from app.models.chat_history_archive import ChatHistoryArchive
+
+        query = db.select(ChatHistoryArchive)
+        if self.session_id:
+            query = query.where(ChatHistoryArchive.session_id == self.session_id)
+        if self.start:
+            query = query.where(ChatHistoryArchive.last_timestamp >= self.start)
+        if self.end:
+            query = query.where(ChatHistoryArchive.first_timestamp < self.end)
+        if self.after:
+            query = query.where(ChatHistoryArchive.last_timestamp >= self.after[0])
+        return (
+            query.order_by(ChatHistoryArchive.first_timestamp, ChatHistoryArchive.id)
+            .execution_options(yield_per=self.yield_per)
+        )
+
+    def _in_range(self, row):
+        if self.start and row.timestamp < self.start:
+            return False
+        if self.end and row.timestamp >= self.end:
+            return False
+        return not self.after or _order_key(row) > (self.after[0], str(self.after[1]))
+
+    def _archived_rows(self):
+        """
+        Archived rows in (timestamp, id) order. A member is only read once
+        every pending row is at or after its first message, so memory holds
+        the sessions that overlap in time, not the whole archive.
+        """
+        from app.services.history_archive import history_archiver
+
+        entries = iter(db.session.execute(self._archive_query()).scalars())
+        entry = next(entries, None)
+        pending = []
+        while pending or entry is not None:
+            while entry is not None and (not pending or entry.first_timestamp <= pending[0][0][0]):
+                for message in history_archiver.read_entry(entry):
+                    row = _ArchivedRow(
+                        message["id"], entry.session_id, message["message"], message["is_user"],
+                        datetime.fromisoformat(message["timestamp"]),
+                    )
+                    if self._in_range(row):
+                        heapq.heappush(pending, (_order_key(row), row))
+                entry = next(entries, None)
+            if pending:
+                yield heapq.heappop(pending)[1]
+
+    def archived_sessions(self):
+        """How many archived sessions fall in the export's range (reported when they are left out)"""
+        query = self._archive_query().order_by(None).subquery()
+        return db.session.execute(db.select(db.func.count(db.distinct(query.c.session_id)))).scalar()
+
+    def _rows(self):
+        rows = db.session.execute(self._query())
+        if not self.include_archived:
+            return rows
+        return heapq.merge(rows, self._archived_rows(), key=_order_key)
+
+    def rows_per_second(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def __iter__(self):
+        self.started_at = time.monotonic()
+        pending = []
+        pending_bytes = 0
+        cursor = None
+
+        for row in self._rows():
+            cursor = encode_cursor(row.timestamp, row.id)
+            line = json.dumps({
+                "id": row.id,
+                "session_id": row.session_id,
+                "message": row.message,
+                "is_user": row.is_user,
+                "timestamp": row.timestamp.isoformat(),
+                "cursor": cursor,
+            }) + "\n"
+            pending.append(line.encode("utf-8"))
+            pending_bytes += len(pending[-1])
+
+            if pending_bytes >= self.chunk_size:
+                yield gzip.compress(b"".join(pending), compresslevel=6, mtime=0)
+                # Only reached once the consumer has taken the whole chunk
+                self.rows += len(pending)
+                self.last_cursor = cursor
+                if self.rows // self.report_every > (self.rows - len(pending)) // self.report_every:
+                    logging.info(f"Exported {self.rows} rows ({self.rows_per_second():.0f} rows/s)")
+                pending, pending_bytes = [], 0
+
+        if pending or not self.rows:
+            yield gzip.compress(b"".join(pending), compresslevel=6, mtime=0)
+            self.rows += len(pending)
+            self.last_cursor = cursor
+        self.finished_at = time.monotonic()
+        logging.info(f"Export finished: {self.rows} rows ({self.rows_per_second():.0f} rows/s)")
@@ -0,0 +1,125 @@
+from app.database import db
+import logging
+import re
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# SQLite: external-content FTS5 index over chat_history.message, kept in sync by triggers
+# and keyed by the stable `seq` column (see upgrade_sqlite_history).
+# Postgres gets a generated tsvector column and GIN index from a Supabase migration instead.
+_SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+        message, content='chat_history', content_rowid='seq', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+        INSERT INTO chat_history_fts(rowid, message) VALUES (new.seq, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+        INSERT INTO chat_history_fts(chat_history_fts, rowid, message) VALUES ('delete', old.seq, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE OF message ON chat_history BEGIN
+        INSERT INTO chat_history_fts(chat_history_fts, rowid, message) VALUES ('delete', old.seq, old.message);
+        INSERT INTO chat_history_fts(rowid, message) VALUES (new.seq, new.message);
+    END
+    """,
+]
+
+_SQLITE_SEARCH = """
+    SELECT h.id, h.session_id, h.message, h.is_user, h.timestamp,
+           snippet(chat_history_fts, 0, '[', ']', '...', 16) AS snippet,
+           -bm25(chat_history_fts) AS rank
+    FROM chat_history_fts
+    JOIN chat_history h ON h.seq = chat_history_fts.rowid
+    WHERE chat_history_fts MATCH :query {session_filter}
+    ORDER BY rank DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+# Rank and paginate on the index first, then build headlines only for the page
+_POSTGRES_SEARCH = """
+    SELECT page.id, page.session_id, page.message, page.is_user, page.timestamp,
+           ts_headline('english', page.message, page.query,
+                       'StartSel=[, StopSel=], MaxFragments=1, MaxWords=16, MinWords=6') AS snippet,
+           page.rank
+    FROM (
+        SELECT h.id, h.session_id, h.message, h.is_user, h.timestamp, q.query,
+               ts_rank_cd(h.message_tsv, q.query) AS rank
+        FROM chat_history h, websearch_to_tsquery('english', :query) AS q(query)
+        WHERE h.message_tsv @@ q.query {session_filter}
+        ORDER BY rank DESC, h.timestamp DESC
+        LIMIT :limit OFFSET :offset
+    ) AS page
+    ORDER BY page.rank DESC, page.timestamp DESC
+"""
+
+def ensure_search_index():
+    """Create the SQLite FTS5 index and triggers if missing; call inside an app context"""
+    if db.engine.dialect.name != "sqlite":
+        return
+    with db.engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'"
+        ).scalar()
+        for statement in _SQLITE_FTS_DDL:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            # Index whatever was written before the index existed
+            conn.exec_driver_sql("INSERT INTO chat_history_fts(chat_history_fts) VALUES ('rebuild')")
+            logging.info("Built full-text index for chat history")
+
+def _sqlite_match(query):
+    """User input as an FTS5 query: every word must match, the last one as a prefix"""
+    terms = _TERM_RE.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search_history(query, session_id=None, limit=20, offset=0):
+    """
+    Ranked full-text search over chat messages, best match first.
+
+    Returns a list of dicts with the message, its session and timestamp,
+    a snippet with matches in [brackets], and a relevance score (higher is
+    better; BM25 on SQLite, ts_rank_cd on Postgres, so not comparable across
+    backends).
+    """
+    params = {"limit": limit, "offset": offset}
+    session_filter = ""
+    if session_id:
+        session_filter = "AND h.session_id = :session_id"
+        params["session_id"] = session_id
+
+    if db.engine.dialect.name == "sqlite":
+        params["query"] = _sqlite_match(query)
+        if params["query"] is None:
+            return []
+        sql = _SQLITE_SEARCH
+    else:
+        params["query"] = query
+        sql = _POSTGRES_SEARCH
+
+    statement = db.text(sql.format(session_filter=session_filter)).columns(
+        id=db.Uuid(as_uuid=False), timestamp=db.DateTime
+    )
+    rows = db.session.execute(statement, params).mappings().all()
+    return [
+        {
+            "id": row["id"],
+            "session_id": row["session_id"],
+            "message": row["message"],
+            "is_user": bool(row["is_user"]),
+            "timestamp": row["timestamp"].isoformat(),
+            "snippet": row["snippet"],
+            "rank": float(row["rank"]),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,202 @@
+from collections import Counter
+from datetime import datetime
+from threading import Condition, Event, Lock, Thread
+from app.config import Config
+from app.database import db
+from app.services.session_buffer import session_buffer
+from app.utils.ids import uuid7
+import atexit
+import logging
+import queue
+import time
+
+class HistoryWriter:
+    """
+    Persistence for ChatHistory rows, optionally write-behind.
+
+    With `enabled` off, rows are added and committed in the request, as
+    before. With it on, rows go to a bounded in-process queue. A background
+    thread drains the queue with bulk inserts, once `batch_size` rows are
+    waiting or every `flush_interval` seconds. When the queue is full a
+    request waits up to `enqueue_timeout` for space, then writes its rows
+    itself; this is the backpressure. Remaining rows are flushed at exit.
+
+    Reads that need their own session's writes (the history endpoint,
+    conversation loading) call wait_for_session() first.
+    """
+
+    def __init__(self, enabled=False, max_queue=10000, batch_size=200, flush_interval=0.5,
+                 enqueue_timeout=1.0):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._pending = Counter()  # session_id -> rows queued but not yet committed
+        self._written = Condition()  # Guards _pending; notified after every write
+        self._flush_lock = Lock()  # One bulk insert at a time
+        self._stop = Event()
+        self._thread = None
+        self._app = None
+
+        self.rows_written = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.failed_rows = 0
+
+    def init_app(self, app):
+        self._app = app
+        if self.enabled and self._thread is None:
+            self._thread = Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def add_exchange(self, session_id, user_message, ai_response, user_timestamp=None):
+        """Persist a user message and the AI reply to it; returns the reply's (timestamp, id)"""
+        now = datetime.utcnow()
+        rows = [
+            {"session_id": session_id, "message": user_message, "is_user": True,
+             "timestamp": user_timestamp or now},
+            {"session_id": session_id, "message": ai_response, "is_user": False, "timestamp": now},
+        ]
+        self.add_rows(rows)
+        return rows[1]["timestamp"], rows[1]["id"]
+
+    def add_rows(self, rows):
+        """
+        Persist ChatHistory rows given as column dicts; rows without an id
+        get one. The session buffer sees the rows once they are committed.
+        """
+        for row in rows:
+            row.setdefault("id", uuid7())
+
+        if not self.enabled:
+            try:
+                self._insert(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            session_buffer.add_rows(rows)
+            return
+
+        with self._written:
+            for row in rows:
+                self._pending[row["session_id"]] += 1
+
+        for index, row in enumerate(rows):
+            try:
+                self.queue.put(row, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # Backpressure: the flusher can't keep up, so this request pays for its own write
+                logging.warning("History write queue full; writing synchronously")
+                self.sync_writes += 1
+                self._write(rows[index:])
+                return
+
+    def _insert(self, rows):
+        from app.models.chat_history import ChatHistory
+
+        db.session.execute(db.insert(ChatHistory), rows)
+
+    def _write(self, rows, attempts=3):
+        """Bulk insert `rows` in one transaction, retrying transient failures"""
+        try:
+            for attempt in range(attempts):
+                try:
+                    with self._flush_lock, self._app.app_context():
+                        try:
+                            self._insert(rows)
+                            db.session.commit()
+                        except Exception:
+                            db.session.rollback()
+                            raise
+                    session_buffer.add_rows(rows)
+                    self.rows_written += len(rows)
+                    self.batches += 1
+                    return
+                except Exception as e:
+                    logging.warning(f"History batch write failed (attempt {attempt + 1}): {e}")
+                    time.sleep(0.2 * (attempt + 1))
+            self.failed_rows += len(rows)
+            logging.error(f"Dropped {len(rows)} chat history rows after {attempts} attempts")
+        finally:
+            with self._written:
+                for row in rows:
+                    self._pending[row["session_id"]] -= 1
+                    if self._pending[row["session_id"]] <= 0:
+                        del self._pending[row["session_id"]]
+                self._written.notify_all()
+
+    def _drain(self, first=None):
+        """Collect up to batch_size queued rows without blocking"""
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Give a burst a moment to accumulate into one batch
+            if self.queue.qsize() < self.batch_size - 1:
+                time.sleep(min(0.05, self.flush_interval))
+            self._write(self._drain(first))
+
+    def flush(self):
+        """Write everything currently queued from the calling thread"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._write(batch)
+
+    def wait_for_session(self, session_id, timeout=5.0):
+        """Block until rows queued for `session_id` are committed (read-your-writes)"""
+        if not self.enabled or not self._pending.get(session_id):
+            return
+        self.flush()
+        give_up_at = time.monotonic() + timeout
+        with self._written:
+            while self._pending.get(session_id):
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    logging.warning(f"Timed out waiting for history writes of session {session_id}")
+                    return
+                self._written.wait(remaining)
+
+    def close(self):
+        """Stop the flusher and write whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2 + 1)
+        self.flush()
+
+    def stats(self):
+        with self._written:
+            pending_sessions = len(self._pending)
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "pending_sessions": pending_sessions,
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "sync_writes": self.sync_writes,
+            "failed_rows": self.failed_rows,
+        }
+
+# Global writer; started by create_app()
+history_writer = HistoryWriter(
+    enabled=Config.HISTORY_WRITE_BEHIND,
+    max_queue=Config.HISTORY_QUEUE_SIZE,
+    batch_size=Config.HISTORY_BATCH_SIZE,
+    flush_interval=Config.HISTORY_FLUSH_INTERVAL,
+)
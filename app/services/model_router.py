@@ -0,0 +1,130 @@
+from collections import deque
+from threading import Lock
+import logging
+import time
+
+class ModelStats:
+    """Rolling latency and error window for one model"""
+
+    def __init__(self, window=200, window_seconds=120):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=window)  # (recorded_at, latency_seconds, failed)
+        self.quota_until = 0.0  # Monotonic time until which the model is treated as throttled
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    def record(self, latency, failed=False):
+        self.samples.append((time.monotonic(), latency, failed))
+
+    def percentile(self, p):
+        latencies = sorted(latency for _, latency, failed in self._recent() if not failed)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def error_rate(self):
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, failed in samples if failed) / len(samples)
+
+    def count(self):
+        return len(self._recent())
+
+class ModelTier:
+    def __init__(self, name, model, slo_p95):
+        self.name = name  # e.g. "primary", "fast"
+        self.model = model  # Gemini model name
+        self.slo_p95 = slo_p95  # Seconds
+
+class ModelRouter:
+    """
+    Pick a Gemini model per request from a list of tiers, most capable first.
+
+    A request starts at the tier its cost suggests: voice turns and short
+    context-free questions go to the fast tier, long or contextual prompts
+    to the primary one. If that tier's rolling p95 latency is over its SLO,
+    its error rate is too high, or it recently returned a quota error, the
+    request moves to the next faster tier. Samples age out after
+    `window_seconds`, so a demoted tier is tried again once it has been
+    quiet for a while.
+    """
+
+    def __init__(self, tiers, long_prompt_chars=400, min_samples=10,
+                 max_error_rate=0.3, quota_cooldown=60, window_seconds=120):
+        self.tiers = tiers
+        self.long_prompt_chars = long_prompt_chars
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.quota_cooldown = quota_cooldown
+
+        self.stats_by_model = {tier.model: ModelStats(window_seconds=window_seconds) for tier in tiers}
+        self.lock = Lock()
+
+    def _start_tier(self, message, has_context, voice):
+        if voice or len(self.tiers) == 1:
+            return len(self.tiers) - 1
+        if has_context or len(message) >= self.long_prompt_chars:
+            return 0
+        return len(self.tiers) - 1
+
+    def _healthy(self, tier):
+        stats = self.stats_by_model[tier.model]
+        if stats.quota_until > time.monotonic():
+            return False
+        if stats.count() < self.min_samples:
+            return True
+        p95 = stats.percentile(95)
+        if p95 is not None and p95 > tier.slo_p95:
+            return False
+        return stats.error_rate() <= self.max_error_rate
+
+    def choose(self, message, has_context=False, voice=False):
+        """Return the model name to use for this request"""
+        with self.lock:
+            index = self._start_tier(message, has_context, voice)
+            while index < len(self.tiers) - 1 and not self._healthy(self.tiers[index]):
+                logging.debug(f"Model tier '{self.tiers[index].name}' unhealthy, routing to a faster tier")
+                index += 1
+            return self.tiers[index].model
+
+    def record(self, model, latency, failed=False, quota=False):
+        """Record the outcome of one upstream call"""
+        with self.lock:
+            stats = self.stats_by_model.get(model)
+            if stats is None:
+                return
+            stats.record(latency, failed)
+            if quota:
+                stats.quota_until = time.monotonic() + self.quota_cooldown
+                logging.warning(f"Quota error from {model}; routing around it for {self.quota_cooldown}s")
+
+    def latency_percentile(self, model, p):
+        """Rolling latency percentile for `model` in seconds, None without enough samples"""
+        with self.lock:
+            stats = self.stats_by_model.get(model)
+            if stats is None or stats.count() < self.min_samples:
+                return None
+            return stats.percentile(p)
+
+    def stats(self):
+        with self.lock:
+            result = {}
+            for tier in self.tiers:
+                stats = self.stats_by_model[tier.model]
+                p50, p95 = stats.percentile(50), stats.percentile(95)
+                result[tier.name] = {
+                    "model": tier.model,
+                    "samples": stats.count(),
+                    "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                    "slo_p95_ms": round(tier.slo_p95 * 1000),
+                    "error_rate": round(stats.error_rate(), 3),
+                    "healthy": self._healthy(tier),
+                }
+            return result
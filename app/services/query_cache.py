@@ -0,0 +1,160 @@
+from threading import Lock
+from app.config import Config
+import logging
+import re
+import zlib
+import numpy as np
+
+_CONTRACTIONS = {
+    "can't": "cannot",
+    "won't": "will not",
+    "shan't": "shall not",
+    "let's": "let us",
+    "what's": "what is",
+    "where's": "where is",
+    "who's": "who is",
+    "how's": "how is",
+    "when's": "when is",
+    "why's": "why is",
+    "that's": "that is",
+    "there's": "there is",
+    "here's": "here is",
+    "it's": "it is",
+    "he's": "he is",
+    "she's": "she is",
+    "i'm": "i am",
+}
+_CONTRACTION_RE = re.compile(r"\b(" + "|".join(re.escape(c) for c in _CONTRACTIONS) + r")\b")
+_SUFFIX_RE = re.compile(r"(n't|'re|'ll|'ve|'d)\b")
+_SUFFIXES = {"n't": " not", "'re": " are", "'ll": " will", "'ve": " have", "'d": " would"}
+# Sentence punctuation and quotes around words; symbols inside a word ("2+2",
+# "c++", "c#", "3.5") are part of the question and stay in the key
+_PUNCTUATION = "?!.,;:\"'\u201c\u201d\u2018"
+_PUNCTUATION_RE = re.compile(rf"[{_PUNCTUATION}]+(?=\s|$)|(?:^|(?<=\s))[{_PUNCTUATION}]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Words that can differ between two phrasings of the same question. Negations
+# ("not", "no", "without", ...) are deliberately absent: they change the meaning.
+_FUNCTION_WORDS = frozenset("""
+    a an the is are was were be been am do does did i me my you your we us our
+    it its this that these those to of in on at for from by about as and or
+    please tell what whats which who how can could would will shall should
+    just really some any there here so
+""".split())
+
+def content_words(query: str):
+    """The words of a normalized query that carry its meaning, in order"""
+    return tuple(word for word in query.split() if word not in _FUNCTION_WORDS)
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form of a user query for cache lookups: lower case, expanded
+    contractions, no sentence punctuation or quotes, single spaces.
+    """
+    text = text.lower().replace("’", "'")
+    text = _CONTRACTION_RE.sub(lambda m: _CONTRACTIONS[m.group(1)], text)
+    text = _SUFFIX_RE.sub(lambda m: _SUFFIXES[m.group(1)], text)
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+class NearDuplicateIndex:
+    """
+    Similarity index over recently answered, context-free queries.
+
+    Each normalized query is embedded as a hashed bag of character trigrams
+    (L2-normalized, `dim` floats) and stored in a fixed-size ring buffer.
+    A lookup is one matrix-vector product over the buffer. The trigram
+    score only shortlists candidates: the best one at or above `threshold`
+    is returned only if it has exactly the same content words, in the same
+    order, as the query. Phrasings may differ in function words and
+    contractions ("what's the capital of France" ~ "what is capital of
+    France"), but never in a content word, a negation, a number or an
+    operator ("banana" vs "bandana", "with" vs "without alcohol", "2+2" vs
+    "2+3" or "2*2", "c++" vs "c#").
+
+    Only context-free questions (a session's first message) are indexed;
+    replies that depend on the conversation are cached by their exact
+    prompt instead.
+    """
+
+    def __init__(self, capacity=2048, dim=1024, threshold=0.95):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._queries = [None] * capacity
+        self._slots = {}  # normalized query -> slot
+        self._next = 0
+        self._count = 0
+        self.lock = Lock()
+
+        self.lookups = 0
+        self.matches = 0
+
+    def _embed(self, query: str):
+        padded = f" {query} "
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector
+
+    def add(self, query: str):
+        """Index a normalized query whose answer has just been cached"""
+        if not query:
+            return
+        vector = self._embed(query)
+        with self.lock:
+            if query in self._slots:
+                return
+            slot = self._next
+            evicted = self._queries[slot]
+            if evicted is not None:
+                del self._slots[evicted]
+            self._vectors[slot] = vector
+            self._queries[slot] = query
+            self._slots[query] = slot
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def lookup(self, query: str):
+        """Return the most similar indexed query, or None below the threshold"""
+        if not query:
+            return None
+        vector = self._embed(query)
+        with self.lock:
+            self.lookups += 1
+            if not self._count:
+                return None
+            scores = self._vectors[:self._count] @ vector
+            shortlist = np.flatnonzero(scores >= self.threshold)
+            candidates = [(float(scores[slot]), self._queries[slot]) for slot in shortlist]
+
+        words = content_words(query)
+        for score, match in sorted(candidates, reverse=True):
+            if content_words(match) == words:
+                break
+        else:
+            return None
+        self.matches += 1
+        logging.debug(f"Near-duplicate query match ({score:.3f}): '{query}' ~ '{match}'")
+        return match
+
+    def stats(self):
+        return {
+            "entries": self._count,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+# Global index; a threshold above 1 disables near-duplicate matching
+query_index = NearDuplicateIndex(
+    capacity=Config.QUERY_INDEX_SIZE,
+    dim=Config.QUERY_INDEX_DIM,
+    threshold=Config.QUERY_SIMILARITY_THRESHOLD,
+)
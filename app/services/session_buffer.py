@@ -0,0 +1,217 @@
+from collections import OrderedDict, deque
+from threading import Lock
+from app.config import Config
+import sys
+import time
+
+class Turn:
+    """One chat message, kept small: no SQLAlchemy state, no per-instance dict"""
+
+    __slots__ = ("id", "message", "is_user", "timestamp")
+
+    def __init__(self, id, message, is_user, timestamp):
+        self.id = id
+        self.message = message
+        self.is_user = is_user
+        self.timestamp = timestamp
+
+    def size(self):
+        """Approximate bytes held by this turn"""
+        return sys.getsizeof(self) + sys.getsizeof(self.message) + 64
+
+class _SessionTurns:
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # Oldest first
+        self.bytes = 0
+        self.complete = False  # True while `turns` holds every message of the session
+        self.checked_at = time.monotonic()  # When `turns` was last confirmed against the database
+
+    def last_key(self):
+        """(timestamp, id) of the newest buffered turn, or None"""
+        if not self.turns:
+            return None
+        return self.turns[-1].timestamp, str(self.turns[-1].id)
+
+    def append(self, turn):
+        if len(self.turns) == self.turns.maxlen:
+            self.bytes -= self.turns[0].size()
+            self.complete = False
+        self.turns.append(turn)
+        self.bytes += turn.size()
+
+class SessionBuffer:
+    """
+    Last `max_turns` messages of recently active sessions, in memory.
+
+    Each session is a ring buffer of Turn records. Sessions are kept in an
+    LRU and the least recently used ones are evicted once there are more
+    than `max_sessions` of them or their turns exceed `max_bytes`.
+
+    The buffer is filled on write (HistoryWriter.add_rows) and, on a miss,
+    loaded from the session's most recent ChatHistory rows. Writes for a
+    session that is not buffered are not kept: the next read loads them.
+
+    Other workers write to the same sessions without touching this
+    process's buffer. A session confirmed against the database less than
+    `trust_seconds` ago is served without a query; after that, a read
+    compares the newest buffered (timestamp, id) with the database's (one
+    index-only query), reloads the session if they differ, and trusts it
+    again for `trust_seconds`. This process's own writes are always
+    visible: reads wait for the session's queued rows, which land in the
+    buffer when committed. With `trust_seconds` 0 every read is checked.
+    """
+
+    def __init__(self, max_turns=50, max_sessions=2000, max_bytes=64 * 1024 * 1024, trust_seconds=2.0):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.trust_seconds = trust_seconds
+
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.checks = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def _evict(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            _, evicted = self._sessions.popitem(last=False)
+            self._bytes -= evicted.bytes
+            self.evictions += 1
+
+    def _latest_key(self, session_id):
+        """(timestamp, id) of the session's newest committed row, or None"""
+        from app.models.chat_history import ChatHistory
+        from app.database import db
+
+        row = db.session.execute(
+            db.select(ChatHistory.timestamp, ChatHistory.id)
+            .where(ChatHistory.session_id == session_id)
+            .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+            .limit(1)
+        ).first()
+        return (row.timestamp, str(row.id)) if row else None
+
+    def _load(self, session_id):
+        """Read the session's most recent rows from ChatHistory"""
+        from app.models.chat_history import ChatHistory
+        from app.database import db
+
+        rows = db.session.execute(
+            db.select(ChatHistory.id, ChatHistory.message, ChatHistory.is_user, ChatHistory.timestamp)
+            .where(ChatHistory.session_id == session_id)
+            .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+            .limit(self.max_turns)
+        ).all()
+
+        state = _SessionTurns(self.max_turns)
+        for row in reversed(rows):
+            state.append(Turn(row.id, row.message, row.is_user, row.timestamp))
+        state.complete = len(rows) < self.max_turns
+        return state
+
+    def _state(self, session_id):
+        from app.services.history_writer import history_writer
+
+        # This process's queued writes for the session land in the buffer once committed
+        history_writer.wait_for_session(session_id)
+        with self.lock:
+            state = self._sessions.get(session_id)
+            if state is not None and time.monotonic() - state.checked_at < self.trust_seconds:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return state
+
+        if state is not None:
+            checked_at = time.monotonic()
+            latest_key = self._latest_key(session_id)
+            with self.lock:
+                self.checks += 1
+                last_key = state.last_key()
+            if latest_key == last_key:
+                with self.lock:
+                    state.checked_at = checked_at
+                    if session_id in self._sessions:
+                        self._sessions.move_to_end(session_id)
+                    self.hits += 1
+                return state
+            # Another worker wrote to (or compaction removed) this session
+            with self.lock:
+                self.stale += 1
+                if self._sessions.get(session_id) is state:
+                    del self._sessions[session_id]
+                    self._bytes -= state.bytes
+        with self.lock:
+            self.misses += 1
+
+        state = self._load(session_id)
+        with self.lock:
+            # Another thread may have loaded the session meanwhile; keep theirs
+            if session_id in self._sessions:
+                state = self._sessions[session_id]
+            else:
+                self._sessions[session_id] = state
+                self._bytes += state.bytes
+            self._sessions.move_to_end(session_id)
+            self._evict()
+        return state
+
+    def recent(self, session_id, limit=None):
+        """
+        The session's last `limit` turns (all buffered turns by default), oldest first.
+
+        Returns (turns, complete), where `complete` is True when the session
+        has no messages older than the returned ones.
+        """
+        state = self._state(session_id)
+        with self.lock:
+            turns = list(state.turns)
+            complete = state.complete
+        if limit is not None and len(turns) > limit:
+            return turns[-limit:], False
+        return turns, complete
+
+    def add_rows(self, rows):
+        """Append newly committed ChatHistory rows (column dicts) to their buffered sessions"""
+        with self.lock:
+            for row in rows:
+                state = self._sessions.get(row["session_id"])
+                if state is None:
+                    continue
+                last_key = state.last_key()
+                if last_key is not None and (row["timestamp"], str(row["id"])) <= last_key:
+                    continue  # Already loaded from the database after the row was committed
+                before = state.bytes
+                state.append(Turn(row["id"], row["message"], row["is_user"], row["timestamp"]))
+                self._bytes += state.bytes - before
+            self._evict()
+
+    def forget(self, session_id):
+        with self.lock:
+            state = self._sessions.pop(session_id, None)
+            if state is not None:
+                self._bytes -= state.bytes
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "checks": self.checks,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+# Global buffer shared by the chat and voice routes
+session_buffer = SessionBuffer(
+    max_turns=Config.SESSION_BUFFER_TURNS,
+    max_sessions=Config.SESSION_BUFFER_MAX_SESSIONS,
+    max_bytes=Config.SESSION_BUFFER_MAX_BYTES,
+    trust_seconds=Config.SESSION_BUFFER_TRUST_SECONDS,
+)
@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+from threading import Lock
+import logging
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for the same result, or the same
+    exception. Nothing is remembered once the call finishes - caching the
+    result is up to the caller.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._calls = {}  # key -> Future of the in-flight call
+
+        self.calls = 0  # Executions actually performed
+        self.coalesced = 0  # Callers served by another caller's execution
+        self.errors = 0
+
+    def do(self, key, func, *args, timeout=None, **kwargs):
+        """
+        Run func(*args, **kwargs) unless a call for `key` is already in flight.
+
+        `timeout` bounds how long a waiter waits for someone else's call
+        (raising TimeoutError); the leader's own call is not affected.
+        """
+        with self.lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logging.debug("Joined in-flight upstream call")
+            return future.result(timeout=timeout)
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.errors += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": len(self._calls),
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+            }
@@ -1,59 +1,114 @@
 import time
-from threading import Lock
+from collections import deque
+from threading import Condition
 import logging
+from .upstream_health import QuotaExceeded
 
 class SyncRateLimiter:
-    """Token bucket algorithm implementation for rate limiting"""
-    
-    def __init__(self, rate_limit=60, per_seconds=60, burst_limit=None):
+    """
+    Token bucket rate limiter for blocking calls.
+
+    Tokens are reserved under a lock, but the rate-limited call itself runs
+    outside it, so callers within the burst limit proceed concurrently.
+    Callers that have to wait for a token are served in FIFO order and give
+    up once their wait exceeds `max_wait` seconds.
+    """
+
+    def __init__(self, rate_limit=60, per_seconds=60, burst_limit=None, max_wait=15.0):
         self.rate_limit = rate_limit  # Number of tokens per time period
         self.per_seconds = per_seconds  # Time period in seconds
         self.burst_limit = burst_limit or rate_limit  # Maximum tokens allowed
-        
+        self.max_wait = max_wait  # Longest a caller queues for a token
+
         self.tokens = self.burst_limit  # Current token count
-        self.last_update = time.time()  # Last token update timestamp
-        self.lock = Lock()  # Thread safety lock
-    
+        self.last_update = time.monotonic()  # Last token update timestamp
+        self.lock = Condition()  # Guards the bucket and the waiter queue
+        self._waiters = deque()  # Tickets of callers waiting for a token, oldest first
+
     def _add_tokens(self):
         """Add new tokens based on elapsed time"""
-        now = time.time()
+        now = time.monotonic()
         elapsed = now - self.last_update
         new_tokens = (elapsed * self.rate_limit) / self.per_seconds
-        
+
         self.tokens = min(self.burst_limit, self.tokens + new_tokens)
         self.last_update = now
-    
-    def execute(self, func, *args, max_retries=3, **kwargs):
+
+    def _time_until_token(self):
+        """Seconds until the bucket holds a whole token"""
+        return max(0.0, (1 - self.tokens) * self.per_seconds / self.rate_limit)
+
+    def acquire(self, timeout=None):
+        """
+        Reserve one token, waiting in FIFO order if none are available.
+
+        Args:
+            timeout: Maximum time to wait in seconds (None waits forever)
+
+        Returns True once a token is reserved, False if the timeout passed.
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+
+        with self.lock:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    self._add_tokens()
+                    is_head = self._waiters[0] is ticket
+                    if is_head and self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+
+                    # Only the head of the queue can be served next, so only
+                    # it needs to wake up for token refills; everyone else
+                    # sleeps until notified that the head has moved.
+                    wait = self._time_until_token() if is_head else None
+                    if give_up_at is not None:
+                        remaining = give_up_at - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self.lock.wait(wait)
+            finally:
+                if self._waiters[0] is ticket:
+                    self._waiters.popleft()
+                else:
+                    self._waiters.remove(ticket)
+                self.lock.notify_all()
+
+    def retry_after(self):
+        """Rough number of seconds until a newly queued caller would get a token"""
+        with self.lock:
+            self._add_tokens()
+            backlog = len(self._waiters) + 1 - self.tokens
+            return max(0.0, backlog * self.per_seconds / self.rate_limit)
+
+    def execute(self, func, *args, deadline=None, **kwargs):
         """
-        Execute a function with rate limiting and retry logic.
-        
+        Execute a function once a token is available.
+
+        The token is reserved before the call, and the call itself happens
+        without holding the lock. Failed calls are not retried here; the
+        upstream health tracker decides when upstream is worth trying again.
+
         Args:
             func: Function to execute
             *args: Positional arguments for the function
-            max_retries: Maximum number of retries
+            deadline: Optional Deadline; waiting for a token stops there
             **kwargs: Keyword arguments for the function
+
+        Raises QuotaExceeded, with a Retry-After estimate, if no token frees
+        up within `max_wait` seconds.
         """
-        retries = 0
-        while retries <= max_retries:
-            with self.lock:
-                self._add_tokens()
-                if self.tokens >= 1:
-                    self.tokens -= 1
-                    try:
-                        return func(*args, **kwargs)
-                    except Exception as e:
-                        if "quota exceeded" in str(e).lower() and retries < max_retries:
-                            wait_time = (2 ** retries) + (time.time() % 1)
-                            logging.warning(f"API quota exceeded. Waiting {wait_time:.2f} seconds before retry.")
-                            time.sleep(wait_time)
-                            retries += 1
-                            continue
-                        raise
-            
-            # If we don't have enough tokens, wait
-            wait_time = (2 ** retries) + (time.time() % 1)
-            logging.warning(f"Rate limit exceeded. Waiting {wait_time:.2f} seconds before retry.")
-            time.sleep(wait_time)
-            retries += 1
-            
-        raise Exception("Max retries exceeded due to rate limiting")
\ No newline at end of file
+        timeout = self.max_wait
+        if deadline is not None:
+            deadline.check()
+            timeout = min(timeout, deadline.remaining())
+        if not self.acquire(timeout=timeout):
+            if deadline is not None:
+                deadline.check()
+            logging.warning(f"Rate limit exceeded. No token within {timeout:.1f} seconds.")
+            raise QuotaExceeded("Rate limit exceeded", self.retry_after())
+
+        return func(*args, **kwargs)
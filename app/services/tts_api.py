@@ -1,9 +1,16 @@
-import edge_tts
-import asyncio
-import io
+from contextlib import closing
+from app.services.tts_cache import audio_cache
+from app.services.tts_engine import tts_engine
 import logging
 
 class TTSService:
+    """
+    Voice settings for speech synthesis.
+
+    Cheap to create: the actual work runs on the process-wide tts_engine,
+    which keeps one event loop and caps concurrent edge-tts sessions.
+    """
+
     def __init__(self):
         self.voice = "en-US-AriaNeural"  # Natural female voice
         self.rate = "+0%"
@@ -12,43 +19,63 @@ class TTSService:
     def text_to_speech(self, text: str) -> bytes:
         """Convert text to speech using Edge TTS (free and fast)"""
         try:
-            return asyncio.run(self._generate_speech(text))
+            return tts_engine.synthesize(text, self.voice, self.rate, self.volume)
         except Exception as e:
             logging.error(f"TTS error: {e}")
             return b""  # Return empty bytes on error
+
+    def speech_future(self, text: str):
+        """
+        Start synthesizing `text` in the background.
+
+        Returns a concurrent.futures.Future of the MP3 bytes; the caller
+        handles errors and waits at most tts_engine.timeout.
+        """
+        return tts_engine.synthesize_future(text, self.voice, self.rate, self.volume)
+
+    def cache_key(self, text: str) -> str:
+        """Audio cache digest for `text` with the current voice settings"""
+        return audio_cache.key(text, self.voice, self.rate, self.volume)
+
+    def cached_speech(self, text: str):
+        """
+        Digest of the cached audio for `text`, synthesizing it on a miss.
+
+        Returns None if the cache is disabled or synthesis failed.
+        """
+        if not audio_cache.enabled:
+            return None
+        digest = self.cache_key(text)
+        if audio_cache.get(digest):
+            return digest
+        audio = self.text_to_speech(text)
+        if not audio:
+            return None
+        audio_cache.put(digest, audio)
+        return digest
+
+    def stream_speech(self, text: str):
+        """
+        Yield MP3 audio chunks for `text` as soon as each one arrives.
+
+        The first bytes can be sent before synthesis finishes. Closing the
+        generator early cancels the synthesis. Audio that was synthesized
+        completely is added to the audio cache.
+        """
+        received = []
+        try:
+            with closing(tts_engine.stream(text, self.voice, self.rate, self.volume)) as chunks:
+                for chunk in chunks:
+                    received.append(chunk)
+                    yield chunk
+        except Exception as e:
+            logging.error(f"TTS stream error: {e}")
+            return
+        audio_cache.put(self.cache_key(text), b"".join(received))
     
-    async def _generate_speech(self, text: str) -> bytes:
-        """Async method to generate speech"""
-        communicate = edge_tts.Communicate(
-            text, 
-            self.voice, 
-            rate=self.rate, 
-            volume=self.volume
-        )
-        
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        
-        return audio_data
-    
-    def get_available_voices(self):
-        """Get list of available voices"""
-        return asyncio.run(self._get_voices())
-    
-    async def _get_voices(self):
-        """Get available voices asynchronously"""
-        voices = await edge_tts.list_voices()
-        return [
-            {
-                'name': voice['Name'],
-                'short_name': voice['ShortName'],
-                'gender': voice['Gender'],
-                'locale': voice['Locale']
-            }
-            for voice in voices
-        ]
+    def get_available_voices(self, locale=None, gender=None):
+        """Get list of available voices, optionally filtered by locale and gender"""
+        return tts_engine.voices(locale=locale, gender=gender)
     
     def set_voice(self, voice_name: str):
         """Change the TTS voice"""
@@ -60,4 +87,7 @@ class TTSService:
     
     def set_volume(self, volume: str):
         """Set speech volume (e.g., '+50%', '-20%')"""
-        self.volume = volume
\ No newline at end of file
+        self.volume = volume
+
+# Default voice settings for routes that don't change them
+tts_service = TTSService()
@@ -0,0 +1,156 @@
+from threading import Lock
+from app.config import Config
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class AudioCache:
+    """
+    Content-addressed disk cache for synthesized speech, shared by all workers.
+
+    Audio is stored under the SHA-256 of (text, voice, rate, volume), sharded
+    into subdirectories by the first two hex characters. Files are written
+    to a temporary name and renamed into place, so readers in any process
+    see either nothing or a complete file. A read refreshes the file's mtime.
+    Once the files exceed `max_bytes`, the least recently used ones are
+    deleted until usage is back under 90% of the budget.
+
+    An empty `directory` disables the cache.
+    """
+
+    SUFFIX = ".mp3"
+    RESCAN_EVERY = 100  # Writes between full scans, to account for other workers' files
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = bool(directory)
+
+        self._bytes = None  # Estimated usage; None until the first scan
+        self._writes = 0
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(text, voice, rate, volume):
+        """Digest identifying the audio for this text and voice settings"""
+        material = json.dumps([text, voice, rate, volume], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_digest(value):
+        return bool(_DIGEST_RE.match(value))
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + self.SUFFIX)
+
+    def get(self, digest):
+        """Path of the cached audio, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self.path(digest)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def read(self, digest):
+        """Cached audio bytes, or None if missing (e.g. evicted meanwhile)"""
+        try:
+            with open(self.path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, audio):
+        """Store audio atomically; errors are logged, never raised"""
+        if not self.enabled or not audio:
+            return
+        path = self.path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logging.error(f"Audio cache write failed: {e}")
+            return
+
+        with self.lock:
+            self._writes += 1
+            if self._bytes is not None:
+                self._bytes += len(audio)
+            if self._bytes is None or self._bytes > self.max_bytes or self._writes % self.RESCAN_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        """Rescan the directory and delete least recently used files over budget; call with the lock held"""
+        files = []
+        total = 0
+        stale_before = time.time() - 3600
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    # Left behind by a crashed writer
+                    if stat.st_mtime < stale_before:
+                        self._remove(entry.path)
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > self.max_bytes:
+            files.sort()
+            target = self.max_bytes * 0.9
+            for _, size, path in files:
+                if total <= target:
+                    break
+                self._remove(path)
+                total -= size
+                self.evictions += 1
+        self._bytes = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+# Global audio cache shared by the voice routes
+audio_cache = AudioCache(Config.TTS_CACHE_DIR, max_bytes=Config.TTS_CACHE_MAX_BYTES)
@@ -0,0 +1,200 @@
+from collections import defaultdict
+from threading import Lock, Thread
+from app.config import Config
+import asyncio
+import edge_tts
+import logging
+import os
+import queue
+import time
+
+_END = object()  # Marks the end of a streamed synthesis
+
+class TTSEngine:
+    """
+    Per-process edge-tts engine running on one long-lived asyncio loop.
+
+    The loop runs in a daemon thread started on first use (and restarted
+    in a forked worker). Sync code submits synthesis jobs to it with
+    run_coroutine_threadsafe and waits on the returned futures, so no
+    request builds or tears down an event loop, and the engine can also
+    be used from code that is itself running in an event loop. At most
+    `max_sessions` syntheses run at once; further jobs wait their turn.
+
+    The voice list is fetched at most once per `voice_ttl` seconds and
+    indexed by locale and by (locale, gender).
+    """
+
+    def __init__(self, max_sessions=8, voice_ttl=3600, timeout=30.0):
+        self.max_sessions = max_sessions
+        self.voice_ttl = voice_ttl
+        self.timeout = timeout
+
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._semaphore = None
+        self._start_lock = Lock()
+
+        self._voices = None
+        self._voices_by_locale = {}
+        self._voices_by_locale_gender = {}
+        self._voices_expire_at = 0.0
+        self._voices_lock = Lock()
+
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _ensure_loop(self):
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._start_lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                self._semaphore = None
+                self._thread = Thread(target=loop.run_forever, name="tts-loop", daemon=True)
+                self._thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine's loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def _session(self, job):
+        """Run `job()` inside one of the `max_sessions` synthesis slots"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_sessions)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            result = await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+        self.completed += 1
+        return result
+
+    @staticmethod
+    async def _audio_chunks(text, voice, rate, volume):
+        communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+    def synthesize_future(self, text, voice, rate="+0%", volume="+0%"):
+        """Start synthesizing `text` without waiting; the future resolves to the complete MP3 audio"""
+        async def job():
+            chunks = [chunk async for chunk in self._audio_chunks(text, voice, rate, volume)]
+            return b"".join(chunks)
+
+        return self.submit(self._session(job))
+
+    def synthesize(self, text, voice, rate="+0%", volume="+0%"):
+        """Complete MP3 audio for `text`; raises on failure or after `timeout` seconds"""
+        future = self.synthesize_future(text, voice, rate, volume)
+        try:
+            return future.result(timeout=self.timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stream(self, text, voice, rate="+0%", volume="+0%"):
+        """
+        Yield MP3 audio chunks for `text` as the engine receives them.
+
+        Closing the generator early cancels the synthesis.
+        """
+        chunks = queue.Queue()
+
+        async def job():
+            try:
+                async for chunk in self._audio_chunks(text, voice, rate, volume):
+                    chunks.put(chunk)
+            finally:
+                chunks.put(_END)
+
+        future = self.submit(self._session(job))
+        try:
+            while True:
+                chunk = chunks.get(timeout=self.timeout)
+                if chunk is _END:
+                    break
+                yield chunk
+            future.result(timeout=self.timeout)  # Surface synthesis errors
+        finally:
+            future.cancel()
+
+    def voices(self, locale=None, gender=None):
+        """Available voices, optionally only those for `locale` and/or `gender`"""
+        with self._voices_lock:
+            if self._voices is None or time.monotonic() >= self._voices_expire_at:
+                try:
+                    self._load_voices()
+                except Exception as e:
+                    if self._voices is None:
+                        raise
+                    # Keep serving the stale list; retry in a minute
+                    logging.warning(f"Voice list refresh failed, keeping cached list: {e}")
+                    self._voices_expire_at = time.monotonic() + 60
+            if locale and gender:
+                return list(self._voices_by_locale_gender.get((locale.lower(), gender.lower()), []))
+            if locale:
+                return list(self._voices_by_locale.get(locale.lower(), []))
+            if gender:
+                return [voice for voice in self._voices if voice["gender"].lower() == gender.lower()]
+            return list(self._voices)
+
+    def _load_voices(self):
+        """Refresh the voice list and its indexes; call with _voices_lock held"""
+        raw = self.submit(edge_tts.list_voices()).result(timeout=self.timeout)
+        voices = [
+            {
+                'name': voice['Name'],
+                'short_name': voice['ShortName'],
+                'gender': voice['Gender'],
+                'locale': voice['Locale']
+            }
+            for voice in raw
+        ]
+        by_locale = defaultdict(list)
+        by_locale_gender = defaultdict(list)
+        for voice in voices:
+            by_locale[voice["locale"].lower()].append(voice)
+            by_locale_gender[(voice["locale"].lower(), voice["gender"].lower())].append(voice)
+
+        self._voices = voices
+        self._voices_by_locale = dict(by_locale)
+        self._voices_by_locale_gender = dict(by_locale_gender)
+        self._voices_expire_at = time.monotonic() + self.voice_ttl
+        logging.info(f"Loaded {len(voices)} TTS voices")
+
+    def stats(self):
+        return {
+            "running": self._loop is not None and self._pid == os.getpid(),
+            "max_sessions": self.max_sessions,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+# One engine per process, shared by every TTSService
+tts_engine = TTSEngine(
+    max_sessions=Config.TTS_MAX_SESSIONS,
+    voice_ttl=Config.TTS_VOICE_CACHE_TTL,
+    timeout=Config.TTS_TIMEOUT,
+)
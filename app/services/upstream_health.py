@@ -0,0 +1,253 @@
+from threading import Lock
+from app.config import Config
+import logging
+import math
+import time
+
+_QUOTA_MARKERS = (
+    "quota exceeded",
+    "resource has been exhausted",
+    "resource_exhausted",
+    "too many requests",
+    "429",
+)
+
+class UpstreamUnavailable(Exception):
+    """The upstream model can't take this request now; retry after `retry_after` seconds"""
+
+    status_code = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+class QuotaExceeded(UpstreamUnavailable):
+    """Upstream rejected the request for quota / rate-limit reasons"""
+
+    status_code = 429
+
+class CircuitOpen(UpstreamUnavailable):
+    """Requests are failing fast while upstream recovers"""
+
+def is_quota_error(e: Exception) -> bool:
+    """Whether an upstream exception means we are being throttled"""
+    if isinstance(e, QuotaExceeded):
+        return True
+    if getattr(e, "code", None) == 429 or type(e).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(e).lower()
+    return any(marker in message for marker in _QUOTA_MARKERS)
+
+class UpstreamHealth:
+    """
+    Adaptive concurrency limit and circuit breaker for one upstream API.
+
+    The number of concurrent calls is adjusted AIMD-style: each fast
+    success adds 1/limit, while a throttled call halves the limit and a slow
+    one trims it by 10%. Calls over the limit are shed at once instead of
+    queueing.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every call fails fast with a Retry-After until `open_seconds` pass.
+    Then a few half-open probe calls are let through. A successful probe
+    closes the circuit; a failed one reopens it for twice as long, up to
+    `max_open_seconds`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, min_limit=1, max_limit=16, initial_limit=8, latency_target=10.0,
+                 failure_threshold=5, open_seconds=15, max_open_seconds=300, half_open_probes=1):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = open_seconds
+        self.open_until = 0.0
+        self.probes = 0
+        self.lock = Lock()
+
+        self.shed = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self.open_until = now + self.open_seconds
+        logging.warning(f"Upstream circuit opened for {self.open_seconds}s")
+
+    def acquire(self):
+        """
+        Claim a slot for one upstream call, or raise UpstreamUnavailable.
+
+        Every successful acquire() must be paired with release() (or
+        cancel() if the call never ran).
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self.open_until:
+                    self.rejected += 1
+                    raise CircuitOpen("Upstream temporarily unavailable", self.open_until - now)
+                self.state = self.HALF_OPEN
+                self.probes = 0
+                logging.info("Upstream circuit half-open, probing")
+
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpen("Upstream temporarily unavailable", 1)
+                self.probes += 1
+            elif self.in_flight >= int(self.limit):
+                self.shed += 1
+                raise UpstreamUnavailable("Too many concurrent upstream requests", 1)
+
+            self.in_flight += 1
+
+    def try_acquire(self):
+        """
+        Claim a slot for an optional extra call (a hedge) if one is free
+        while the circuit is closed; returns False instead of shedding.
+        """
+        with self.lock:
+            if self.state != self.CLOSED or self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def cancel(self):
+        """Give back a slot whose call never ran, without recording an outcome"""
+        with self.lock:
+            self.in_flight -= 1
+            if self.state == self.HALF_OPEN:
+                self.probes = max(0, self.probes - 1)
+
+    def release(self, latency, error=None):
+        """Record the outcome of a call started with acquire()"""
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if error is None:
+                if latency > self.latency_target:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.consecutive_failures = 0
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                    self.open_seconds = self.base_open_seconds
+                    logging.info("Upstream circuit closed")
+                return
+
+            if is_quota_error(error):
+                self.throttled += 1
+                self.limit = max(self.min_limit, self.limit / 2)
+            self.consecutive_failures += 1
+
+            if self.state == self.HALF_OPEN:
+                self.open_seconds = min(self.max_open_seconds, self.open_seconds * 2)
+                self._open(now)
+            elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open(now)
+
+    def retry_after(self):
+        """Seconds a client should wait before retrying after a failure"""
+        with self.lock:
+            if self.state == self.OPEN:
+                return max(1.0, self.open_until - time.monotonic())
+            return self.base_open_seconds
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "consecutive_failures": self.consecutive_failures,
+                "shed": self.shed,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+            }
+
+class HeldStream:
+    """
+    Iterator over a streamed upstream response that holds its
+    UpstreamHealth slot until the stream is exhausted, fails or is closed,
+    so a stream counts against the concurrency limit for as long as it
+    runs and a failure partway through reaches the circuit breaker.
+
+    close() while a read is still running (one abandoned at a deadline)
+    leaves the release to that read, which is when the call really ends.
+    """
+
+    def __init__(self, health, stream, start):
+        self.health = health
+        self._iterator = iter(stream)
+        self._start = start
+        self._lock = Lock()
+        self._reading = False
+        self._closed = False
+        self._error = None
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            if self._closed:
+                raise StopIteration
+            self._reading = True
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self._release(self._error)
+            raise
+        except Exception as e:
+            self._release(e)
+            raise
+        with self._lock:
+            self._reading = False
+            closed = self._closed
+        if closed:
+            self._release(self._error)
+        return item
+
+    def close(self, error=None):
+        """Stop reading; `error` is why the consumer gave up, if upstream is to blame"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._error = error
+            if self._reading:
+                return
+        self._release(error)
+
+    def _release(self, error):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            self._reading = False
+        self.health.release(time.monotonic() - self._start, error)
+
+# Shared by every Gemini call in this process
+upstream_health = UpstreamHealth(
+    max_limit=Config.UPSTREAM_MAX_CONCURRENCY,
+    initial_limit=Config.UPSTREAM_MAX_CONCURRENCY // 2 or 1,
+    latency_target=Config.UPSTREAM_LATENCY_TARGET_MS / 1000,
+    failure_threshold=Config.UPSTREAM_FAILURE_THRESHOLD,
+    open_seconds=Config.UPSTREAM_OPEN_SECONDS,
+)
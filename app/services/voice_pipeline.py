@@ -0,0 +1,141 @@
+from contextlib import closing
+from threading import Event, Lock, Semaphore, Thread
+from app.config import Config
+from app.services.tts_cache import audio_cache
+import logging
+import queue
+import re
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or a blank line
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|\n\s*\n")
+_END = object()
+
+def split_sentences(pieces, min_chars=20):
+    """
+    Regroup streamed text `pieces` into sentences, yielding each one as
+    soon as the text following it shows that it is complete.
+
+    Sentences shorter than `min_chars` (e.g. "Sure.") are joined with the
+    next one, so very short clips don't each cost a synthesis. Whatever is
+    left when the pieces run out is yielded as the last sentence.
+    """
+    buffer = ""
+    position = 0
+    for piece in pieces:
+        buffer += piece
+        while True:
+            match = _BOUNDARY.search(buffer, position)
+            if not match:
+                break
+            sentence = buffer[:match.end()].strip()
+            if len(sentence) < min_chars:
+                position = match.end()
+                continue
+            yield sentence
+            buffer = buffer[match.end():]
+            position = 0
+    tail = buffer.strip()
+    if tail:
+        yield tail
+
+class VoicePipeline:
+    """
+    Overlaps reply generation with speech synthesis, sentence by sentence.
+
+    A producer thread reads the reply stream, splits it into sentences and
+    starts synthesizing each one on the TTS engine as soon as it is
+    complete, with at most `max_parallel` sentences synthesizing or
+    waiting to be sent at once. The consumer yields the sentences in order
+    as their audio becomes ready, so the first one can be played while
+    later ones are still being generated and synthesized.
+    """
+
+    def __init__(self, max_parallel=3, min_sentence_chars=20, timeout=30.0):
+        self.max_parallel = max_parallel
+        self.min_sentence_chars = min_sentence_chars
+        self.timeout = timeout
+
+    def _produce(self, pieces, tts_service, ready, slots, stop, guard):
+        try:
+            with closing(pieces):
+                for sentence in split_sentences(pieces, self.min_sentence_chars):
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    digest = tts_service.cache_key(sentence) if audio_cache.enabled else None
+                    cached = bool(digest and audio_cache.get(digest))
+                    # Checked and enqueued under `guard`, so no synthesis starts after the consumer's drain
+                    with guard:
+                        if stop.is_set():
+                            return
+                        future = None if cached else tts_service.speech_future(sentence)
+                        ready.put((sentence, digest, future))
+        except Exception as e:
+            ready.put(e)  # Raised by the consumer after the sentences before it
+        finally:
+            ready.put(_END)
+
+    def segments(self, pieces, tts_service):
+        """
+        Yield (text, digest, audio) for each sentence of the reply, in order.
+
+        `pieces` is a generator of reply text (e.g. from
+        get_chat_response_stream); it is closed when this generator is.
+        `audio` is the MP3 bytes, or None when the audio was already in the
+        audio cache under `digest`. `digest` is None if the cache is
+        disabled; if synthesis fails, it is None and `audio` is empty.
+        Closing this generator early stops the producer and cancels
+        syntheses that have not been sent yet. An error from the reply
+        stream (e.g. StreamInterrupted) is raised once the sentences
+        completed before it have been yielded.
+        """
+        ready = queue.Queue()
+        slots = Semaphore(self.max_parallel)
+        stop = Event()
+        guard = Lock()
+        producer = Thread(
+            target=self._produce, args=(pieces, tts_service, ready, slots, stop, guard),
+            name="voice-pipeline", daemon=True,
+        )
+        producer.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                sentence, digest, future = item
+                audio = None
+                try:
+                    if future is not None:
+                        audio = future.result(timeout=self.timeout)
+                        if not audio:
+                            raise ValueError("no audio received")
+                        if digest:
+                            audio_cache.put(digest, audio)
+                except Exception as e:
+                    logging.error(f"Voice pipeline synthesis failed: {e}")
+                    future.cancel()
+                    digest, audio = None, b""
+                finally:
+                    slots.release()
+                yield sentence, digest, audio
+        finally:
+            with guard:
+                stop.set()
+            while True:
+                try:
+                    item = ready.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple) and item[2] is not None:
+                    item[2].cancel()
+
+# Global pipeline used by the streaming voice endpoint
+voice_pipeline = VoicePipeline(
+    max_parallel=Config.VOICE_PIPELINE_MAX_PARALLEL,
+    min_sentence_chars=Config.VOICE_PIPELINE_MIN_SENTENCE_CHARS,
+    timeout=Config.TTS_TIMEOUT,
+)
@@ -6,18 +6,28 @@ import os
 import urllib.request
 import zipfile
 import shutil
+import threading
 import time # For get_sensitivity placeholder
+from collections import OrderedDict
 
 class WakeWordDetector:
     MODEL_URL = "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
     DEFAULT_MODEL_DIR = "vosk-model-small-en-us-0.15" # Consistent default
+    SAMPLE_RATE = 16000 # Rate the model was trained on
 
-    def __init__(self, wake_word="yara", model_path=None, sensitivity=0.6):
+    def __init__(self, wake_word="yara", model_path=None, sensitivity=0.6, client_idle_timeout=30.0, max_clients=1000):
         self.wake_word = wake_word.lower()
         self.is_listening = False
         self.last_confidence = 0.0 # Added for API
         self.sensitivity = sensitivity # Added for API
 
+        # Per-client recognizers for detect(): (client_id, sample_rate) -> _ClientRecognizer,
+        # least recently used first
+        self.client_idle_timeout = client_idle_timeout
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._clients_lock = threading.Lock()
+
         if model_path is None:
             # Use a path relative to the current file for model storage
             self.model_path = os.path.join(os.path.dirname(__file__), self.DEFAULT_MODEL_DIR)
@@ -38,7 +48,8 @@ class WakeWordDetector:
             self.model = vosk.Model(self.model_path)
             # The grammar for Vosk should include the wake word
             # and potentially other common words to improve recognition
-            self.recognizer = vosk.KaldiRecognizer(self.model, 16000, f'["{self.wake_word}", "[unk]"]')
+            # Recognizers hold decoding state, so each client and each stream
+            # gets its own (new_recognizer); only the model is shared
             logging.info("Vosk wake word detector initialized successfully.")
         except Exception as e:
             logging.error(f"Failed to initialize Vosk model from {self.model_path}: {e}")
@@ -90,19 +101,69 @@ class WakeWordDetector:
                 shutil.rmtree(target_model_path)
             raise
 
-    def detect(self, audio_data: bytes) -> bool:
+    def new_recognizer(self, sample_rate: int = SAMPLE_RATE):
+        """
+        A fresh recognizer for the wake word grammar, sharing the loaded model.
+        Audio at other rates than the model's is resampled by Kaldi.
+        """
+        return vosk.KaldiRecognizer(self.model, sample_rate, f'["{self.wake_word}", "[unk]"]')
+
+    def _client_recognizer(self, client_id, sample_rate: int):
+        """
+        The recognizer that keeps `client_id`'s decoding state across
+        detect() calls, created on first use. Clients idle for longer than
+        `client_idle_timeout`, and the least recently used ones past
+        `max_clients`, are dropped.
+        """
+        key = (client_id, sample_rate)
+        now = time.monotonic()
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+            while self._clients:
+                oldest = next(iter(self._clients.values()))
+                idle = now - oldest.last_used > self.client_idle_timeout
+                full = client is None and len(self._clients) >= self.max_clients
+                if oldest is client or not (idle or full):
+                    break
+                self._clients.popitem(last=False)
+            if client is None or client.wake_word != self.wake_word:
+                client = _ClientRecognizer(self.new_recognizer(sample_rate), self.wake_word)
+                self._clients[key] = client
+            client.last_used = now
+            return client
+
+    def detect(self, audio_data: bytes, sample_rate: int = SAMPLE_RATE, client_id=None) -> bool:
         """
-        Detects the wake word in the given audio data.
+        Detects the wake word in the given audio data (16-bit little-endian PCM at `sample_rate`).
+        Audio from the same `client_id` is decoded on one recognizer that
+        keeps its state between calls, so a wake word split across two
+        buffers is still found; different clients never mix their audio.
+        Without a client id the audio is decoded on its own as one utterance.
         Vosk's simple result doesn't provide a direct confidence score for the wake word.
         We'll simulate one based on detection.
         """
-        if self.recognizer.AcceptWaveform(audio_data):
-            result = json.loads(self.recognizer.Result())
-            text = result.get("text", "")
-            if self.wake_word in text:
-                logging.info(f"Wake word '{self.wake_word}' detected in: '{text}'")
-                self.last_confidence = 1.0 # Set to 1.0 if detected
-                return True
+        if client_id is None:
+            recognizer = self.new_recognizer(sample_rate)
+            if recognizer.AcceptWaveform(audio_data):
+                text = json.loads(recognizer.Result()).get("text", "")
+            else:
+                text = json.loads(recognizer.FinalResult()).get("text", "")  # Whatever the audio ended on
+        else:
+            client = self._client_recognizer(client_id, sample_rate)
+            with client.lock:
+                recognizer = client.recognizer
+                if recognizer.AcceptWaveform(audio_data):
+                    text = json.loads(recognizer.Result()).get("text", "")
+                else:
+                    text = json.loads(recognizer.PartialResult()).get("partial", "")
+                if self.wake_word in text:
+                    recognizer.Reset()  # Report each utterance once
+        if self.wake_word in text:
+            logging.info(f"Wake word '{self.wake_word}' detected in: '{text}'")
+            self.last_confidence = 1.0 # Set to 1.0 if detected
+            return True
         self.last_confidence = 0.0 # Reset if not detected
         return False
 
@@ -122,13 +183,9 @@ class WakeWordDetector:
 
     def set_wake_word(self, word: str):
         self.wake_word = word.lower()
-        # Re-initialize recognizer with the new wake word
-        # This assumes the model is already loaded
-        if hasattr(self, 'model') and self.model:
-            self.recognizer = vosk.KaldiRecognizer(self.model, 16000, f'["{self.wake_word}", "[unk]"]')
-            logging.info(f"Wake word changed to: {self.wake_word}")
-        else:
-            logging.warning("Model not loaded, cannot change wake word for active recognizer.")
+        # Recognizers created from now on use the new wake word in their grammar;
+        # clients' recognizers are replaced on their next call
+        logging.info(f"Wake word changed to: {self.wake_word}")
 
     def get_last_confidence(self) -> float:
         """Returns the confidence of the last wake word detection."""
@@ -147,3 +204,14 @@ class WakeWordDetector:
         self.sensitivity = max(0.1, min(1.0, sensitivity))
         logging.info(f"Wake word sensitivity set to: {self.sensitivity}")
 
+
+class _ClientRecognizer:
+    """One HTTP client's recognizer; the lock keeps its overlapping requests in order"""
+
+    __slots__ = ("recognizer", "wake_word", "lock", "last_used")
+
+    def __init__(self, recognizer, wake_word):
+        self.recognizer = recognizer
+        self.wake_word = wake_word
+        self.lock = threading.Lock()
+        self.last_used = 0.0
@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from app.config import Config
+from app.utils.pcm import MAX_SAMPLE_RATE, MIN_SAMPLE_RATE, SAMPLE_FORMATS, to_int16_pcm
+import asyncio
+import json
+import logging
+import websockets
+
+DEFAULT_SAMPLE_RATE = 16000  # The vosk model's rate
+
+class WakeWordStreamServer:
+    """
+    WebSocket server for always-on wake-word detection.
+
+    Each connection streams binary PCM frames and gets its own
+    KaldiRecognizer, so clients never share decoder state; all of them
+    share the detector's vosk Model, loaded once per process. Frames are
+    decoded on a small thread pool, so one event loop can hold hundreds of
+    mostly idle connections, and a `wake_word` event is sent as soon as
+    the wake word shows up in a partial or final result.
+
+    Connections that send nothing for `idle_timeout` seconds are closed.
+    At most `max_streams` are open at once; further handshakes get 503.
+    GET /health returns stats() as JSON.
+    """
+
+    def __init__(self, detector, max_streams=500, idle_timeout=30.0, threads=4, max_frame_bytes=64 * 1024):
+        self.detector = detector
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self.max_frame_bytes = max_frame_bytes
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wakeword")
+
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+        self.idle_closed = 0
+        self.frames = 0
+        self.detections = 0
+
+    @staticmethod
+    def stream_options(path):
+        """
+        (sample_rate, sample_format) from the query string of the connection
+        URL, e.g. /?sample_rate=48000&format=float32. Defaults to 16 kHz int16.
+        Raises ValueError if either is invalid.
+        """
+        query = parse_qs(urlsplit(path).query)
+        sample_format = query.get("format", ["int16"])[0].lower()
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(SAMPLE_FORMATS)}")
+        try:
+            sample_rate = int(query.get("sample_rate", [DEFAULT_SAMPLE_RATE])[0])
+        except ValueError:
+            raise ValueError("sample_rate must be an integer")
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+        return sample_rate, sample_format
+
+    def _accept(self, recognizer, frame, sample_format):
+        """Feed one frame to a connection's recognizer (on the thread pool); returns the text if it has the wake word"""
+        pcm = to_int16_pcm(bytearray(frame) if sample_format == "float32" else frame, sample_format)
+        if recognizer.AcceptWaveform(pcm):
+            text = json.loads(recognizer.Result()).get("text", "")
+        else:
+            text = json.loads(recognizer.PartialResult()).get("partial", "")
+        if self.detector.wake_word in text:
+            recognizer.Reset()  # Report each utterance once
+            return text
+        return None
+
+    async def process_request(self, path, request_headers):
+        """Answer health checks, and refuse handshakes while at capacity (before upgrading)"""
+        if urlsplit(path).path == "/health":
+            return HTTPStatus.OK, [("Content-Type", "application/json")], json.dumps(self.stats()).encode()
+        if self.active >= self.max_streams:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, [("Retry-After", "5")], b"Too many wake word streams\n"
+        return None
+
+    async def handler(self, websocket):
+        """One client's stream: binary PCM frames in, JSON events out"""
+        try:
+            sample_rate, sample_format = self.stream_options(websocket.path)
+        except ValueError as e:
+            await websocket.close(1008, str(e))
+            return
+        if self.active >= self.max_streams:
+            # Handshakes that passed process_request at the same time
+            self.rejected += 1
+            await websocket.close(1013, "Too many wake word streams")
+            return
+
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        loop = asyncio.get_running_loop()
+        try:
+            recognizer = await loop.run_in_executor(self.executor, self.detector.new_recognizer, sample_rate)
+            await websocket.send(json.dumps({
+                "type": "ready",
+                "wake_word": self.detector.wake_word,
+                "sample_rate": sample_rate,
+                "format": sample_format,
+            }))
+            while True:
+                try:
+                    frame = await asyncio.wait_for(websocket.recv(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    self.idle_closed += 1
+                    await websocket.close(1000, "Idle timeout")
+                    return
+                if isinstance(frame, str):
+                    await websocket.send(json.dumps({"type": "error", "error": "Send audio as binary frames"}))
+                    continue
+                try:
+                    text = await loop.run_in_executor(self.executor, self._accept, recognizer, frame, sample_format)
+                except ValueError as e:
+                    await websocket.send(json.dumps({"type": "error", "error": str(e)}))
+                    continue
+                self.frames += 1
+                if text is not None:
+                    self.detections += 1
+                    await websocket.send(json.dumps({"type": "wake_word", "text": text, "confidence": 1.0}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.active -= 1
+
+    async def serve(self, host, port, stop=None):
+        """Serve until `stop` (an awaitable) completes, or forever"""
+        async with websockets.serve(
+            self.handler, host, port,
+            process_request=self.process_request,
+            max_size=self.max_frame_bytes,
+            max_queue=8,  # Frames buffered per connection before reads pause
+            compression=None,  # PCM barely compresses; deflate state costs memory per connection
+        ):
+            logging.info(f"Wake word stream server listening on {host}:{port} (max {self.max_streams} streams)")
+            await (stop if stop is not None else asyncio.get_running_loop().create_future())
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "peak": self.peak,
+            "max_streams": self.max_streams,
+            "rejected": self.rejected,
+            "idle_closed": self.idle_closed,
+            "frames": self.frames,
+            "detections": self.detections,
+        }
+
+def create_stream_server(detector=None):
+    """A WakeWordStreamServer configured from Config, loading the vosk model if no detector is given"""
+    if detector is None:
+        from app.services.wakeword_local import WakeWordDetector
+        detector = WakeWordDetector(wake_word=Config.WAKE_WORD, sensitivity=Config.WAKE_WORD_SENSITIVITY)
+    return WakeWordStreamServer(
+        detector,
+        max_streams=Config.WAKEWORD_WS_MAX_STREAMS,
+        idle_timeout=Config.WAKEWORD_WS_IDLE_TIMEOUT,
+        threads=Config.WAKEWORD_WS_THREADS,
+        max_frame_bytes=Config.WAKEWORD_WS_MAX_FRAME_BYTES,
+    )
@@ -4,6 +4,8 @@ class ChatManager {
     constructor() {
         this.messages = [];
         this.isVoiceMode = false;
+        this.historyBefore = null; // Cursor of the oldest loaded message while older ones exist
+        this.loadingHistory = false;
 
         this.init();
     }
@@ -42,6 +44,16 @@ class ChatManager {
         if (voiceInputBtn) {
             voiceInputBtn.addEventListener('click', () => this.startVoiceInput());
         }
+
+        // Load older pages of history when scrolled to the top
+        const chatMessages = document.getElementById('chat-messages');
+        if (chatMessages) {
+            chatMessages.addEventListener('scroll', () => {
+                if (chatMessages.scrollTop < 50) {
+                    this.loadOlderHistory();
+                }
+            });
+        }
     }
 
     async sendMessage() {
@@ -137,18 +149,30 @@ class ChatManager {
 
     async speakMessage(message) {
         try {
+            // Binary envelope: 4-byte big-endian JSON length, the JSON, then the raw audio
             const response = await fetch('/api/voice/process', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/vnd.yara.voice'
                 },
                 body: JSON.stringify({ text: message })
             });
 
-            const data = await response.json();
+            if (response.headers.get('Content-Type') !== 'application/vnd.yara.voice') {
+                const data = await response.json();
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
 
-            if (data.audio) {
-                const audio = new Audio(`data:audio/wav;base64,${data.audio}`);
+            const body = await response.arrayBuffer();
+            const metadataLength = new DataView(body).getUint32(0);
+            const data = JSON.parse(new TextDecoder().decode(new Uint8Array(body, 4, metadataLength)));
+
+            if (data.audio_length) {
+                const blob = new Blob([body.slice(4 + metadataLength)], { type: data.audio_type });
+                const audioUrl = URL.createObjectURL(blob);
+                const audio = new Audio(audioUrl);
+                audio.addEventListener('ended', () => URL.revokeObjectURL(audioUrl));
                 audio.play();
             }
         } catch (error) {
@@ -171,6 +195,7 @@ class ChatManager {
         }
 
         this.messages = [];
+        this.historyBefore = null;
         UIManager.showNotification('Chat history cleared.', 'info');
     }
 
@@ -184,11 +209,46 @@ class ChatManager {
                     this.addMessage(chat.message, chat.is_user);
                 });
             }
+            this.historyBefore = data.has_more ? data.before : null;
         } catch (error) {
             console.error('Error loading chat history:', error);
             UIManager.showNotification('Could not load chat history.', 'error');
         }
     }
+
+    async loadOlderHistory() {
+        if (!this.historyBefore || this.loadingHistory) return;
+        this.loadingHistory = true;
+
+        try {
+            const response = await fetch(`/api/chat/history?before=${encodeURIComponent(this.historyBefore)}`);
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || 'Failed to load history');
+            }
+
+            const chatMessages = document.getElementById('chat-messages');
+            const firstMessage = chatMessages.firstChild;
+            const previousHeight = chatMessages.scrollHeight;
+
+            (data.history || []).forEach(chat => {
+                chatMessages.insertBefore(UIManager.createMessageElement(chat.message, chat.is_user), firstMessage);
+            });
+            this.messages.unshift(...(data.history || []).map(chat => ({
+                content: chat.message,
+                isUser: chat.is_user,
+                timestamp: Date.parse(chat.timestamp)
+            })));
+
+            // Keep the messages that were on screen in place
+            chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+            this.historyBefore = data.has_more ? data.before : null;
+        } catch (error) {
+            console.error('Error loading older chat history:', error);
+        } finally {
+            this.loadingHistory = false;
+        }
+    }
 }
 
 document.addEventListener('DOMContentLoaded', () => {
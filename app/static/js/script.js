@@ -180,26 +180,44 @@ class YaraAssistant {
         this.showTypingIndicator();
         
         try {
-            const response = await fetch('/api/voice/process', {
+            // Pipelined reply: sentences arrive (as Server-Sent Events) with their
+            // audio while later ones are still being generated, and play in order
+            const response = await fetch('/api/voice/process/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ text: text })
+                body: JSON.stringify({ text: text, inline_audio: false })
             });
             
-            const data = await response.json();
-            
-            if (data.error) {
-                throw new Error(data.error);
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.error || `HTTP ${response.status}`);
             }
             
-            this.showAIMessage(data.response);
-            
-            // Play audio response
-            if (data.audio) {
-                await this.playAudioResponse(data.audio);
-            }
+            let messageText = null;
+            let playback = Promise.resolve();
+            await this.readEventStream(response, (event, data) => {
+                if (event === 'segment') {
+                    if (messageText === null) {
+                        this.hideTypingIndicator();
+                        messageText = this.showAIMessage('').querySelector('p');
+                    }
+                    messageText.textContent = `${messageText.textContent} ${data.text}`.trim();
+                    this.scrollToBottom();
+                    
+                    // Cached file URL, or inline base64 as a fallback
+                    const audioSrc = data.audio_url || (data.audio && `data:audio/mp3;base64,${data.audio}`);
+                    if (audioSrc) {
+                        playback = playback.then(() => this.playAudioUntilEnded(audioSrc));
+                    }
+                } else if (event === 'done' && messageText === null) {
+                    this.showAIMessage(data.response);
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                }
+            });
+            await playback;
             
         } catch (error) {
             console.error('Error processing voice input:', error);
@@ -266,6 +284,7 @@ class YaraAssistant {
         const messageEl = this.createMessageElement(message, false);
         conversation.appendChild(messageEl);
         this.scrollToBottom();
+        return messageEl;
     }
     
     createMessageElement(message, isUser) {
@@ -320,7 +339,7 @@ class YaraAssistant {
         }
     }
     
-    async playAudioResponse(audioBase64) {
+    async playAudioResponse(audioSrc) {
         try {
             // Stop any currently playing audio
             if (this.currentAudio) {
@@ -329,7 +348,7 @@ class YaraAssistant {
             }
             
             // Create audio element
-            const audio = new Audio(`data:audio/mp3;base64,${audioBase64}`);
+            const audio = new Audio(audioSrc);
             this.currentAudio = audio;
             
             // Update avatar state
@@ -354,6 +373,62 @@ class YaraAssistant {
         }
     }
     
+    async readEventStream(response, onEvent) {
+        // Minimal Server-Sent Events parser for a fetch() response body
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+    
+    playAudioUntilEnded(audioSrc) {
+        // Resolves once the clip has finished (or failed), so segments play back to back
+        return new Promise((resolve) => {
+            const audio = new Audio(audioSrc);
+            this.currentAudio = audio;
+            
+            const avatar = document.getElementById('yara-avatar');
+            if (avatar) {
+                avatar.classList.add('avatar-speaking');
+            }
+            
+            const finish = () => {
+                if (avatar) {
+                    avatar.classList.remove('avatar-speaking');
+                }
+                if (this.currentAudio === audio) {
+                    this.currentAudio = null;
+                }
+                resolve();
+            };
+            audio.addEventListener('ended', finish);
+            audio.addEventListener('error', finish);
+            audio.play().catch((error) => {
+                console.error('Error playing audio:', error);
+                finish();
+            });
+        });
+    }
+    
     updateMicButton() {
         const micButton = document.getElementById('mic-button');
         if (!micButton) return;
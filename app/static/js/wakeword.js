@@ -11,6 +11,8 @@ class WakeWordDetector {
         this.processor = null;
         this.bufferSize = 4096;
         this.sampleRate = 16000; // Vosk model expects 16kHz
+        this.streamUrl = window.WAKEWORD_STREAM_URL || null; // ws(s):// URL of wakeword_server.py, if deployed
+        this.socket = null;
 
         this.init();
     }
@@ -75,6 +77,11 @@ class WakeWordDetector {
             this.microphone = null;
         }
 
+        if (this.socket) {
+            this.socket.close();
+            this.socket = null;
+        }
+
         // Stop the media stream tracks
         if (this.audioContext && this.audioContext.state !== 'closed') {
             this.audioContext.close().then(() => {
@@ -118,16 +125,65 @@ class WakeWordDetector {
         }
     }
 
+    toInt16(audioData) {
+        const pcm = new Int16Array(audioData.length);
+        for (let i = 0; i < audioData.length; i++) {
+            const sample = Math.max(-1, Math.min(1, audioData[i]));
+            pcm[i] = sample * 32767;
+        }
+        return pcm;
+    }
+
+    streamToServer(pcm) {
+        // One long-lived connection with its own recognizer on the server;
+        // frames captured while it is (re)connecting are dropped
+        if (!this.socket) {
+            const url = `${this.streamUrl}?sample_rate=${this.audioContext.sampleRate}&format=int16`;
+            const socket = new WebSocket(url);
+            let opened = false;
+            this.socket = socket;
+            socket.binaryType = 'arraybuffer';
+            socket.onopen = () => {
+                opened = true;
+            };
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'wake_word') {
+                    this.onWakeWordDetected();
+                }
+            };
+            socket.onclose = () => {
+                this.socket = null;
+                if (!opened) {
+                    // Stream server unreachable: post audio to the HTTP endpoint instead
+                    console.warn('Wake word stream server unreachable; using HTTP detection');
+                    this.streamUrl = null;
+                }
+            };
+        }
+        if (this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(pcm.buffer);
+        }
+    }
+
     async processOnServer(audioData) {
+        // Raw little-endian Int16 PCM (2 bytes per sample) instead of a JSON
+        // array of floats; the server reads it without parsing
+        const pcm = this.toInt16(audioData);
+        if (this.streamUrl) {
+            this.streamToServer(pcm);
+            return;
+        }
+
         try {
-            // Convert Float32Array to a regular Array for JSON serialization
-            const audioArray = Array.from(audioData);
             const response = await fetch('/api/wakeword/detect', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json' // Changed to JSON
+                    'Content-Type': 'application/octet-stream',
+                    'X-Sample-Format': 'int16',
+                    'X-Sample-Rate': String(this.audioContext.sampleRate)
                 },
-                body: JSON.stringify({ audio_data: audioArray }) // Send as JSON array
+                body: pcm.buffer
             });
 
             const result = await response.json();
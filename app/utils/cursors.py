@@ -0,0 +1,28 @@
+from datetime import datetime
+from app.utils.ids import legacy_uuid
+import base64
+import uuid
+
+def encode_cursor(timestamp, row_id):
+    """Opaque, URL-safe cursor for a chat history row's (timestamp, id) position"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    (timestamp, id) from encode_cursor(); raises ValueError if malformed.
+    Cursors issued while ids were integers map to the UUID the row was
+    given when its table was upgraded.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    try:
+        timestamp, row_id = raw.split("|", 1)
+        timestamp = datetime.fromisoformat(timestamp)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if row_id.isdigit():
+        return timestamp, legacy_uuid(timestamp, int(row_id))
+    return timestamp, str(uuid.UUID(row_id))
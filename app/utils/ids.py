@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from threading import Lock
+import os
+import time
+import uuid
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7() -> str:
+    """
+    New UUIDv7 (RFC 9562) as a string: 48-bit Unix milliseconds, then random bits.
+
+    IDs sort by creation time, so inserts append to the right edge of the
+    primary key index instead of landing on random pages. Within one
+    millisecond the 12-bit `rand_a` field is used as a counter (seeded at
+    random each millisecond), so IDs from this process are also strictly
+    increasing.
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF  # Leave headroom before overflow
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+        unix_ms, rand_a = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (unix_ms << 80) | (0x7 << 76) | (rand_a << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value))
+
+def legacy_uuid(timestamp: datetime, row_id: int) -> str:
+    """
+    Deterministic UUIDv7 for a row that had the integer id `row_id` before
+    ids became UUIDs: the row's `timestamp` (naive UTC) fills the time
+    field and the integer the random bits. Used when an old SQLite history
+    table is upgraded, and to map cursors issued before that onto the same
+    rows.
+    """
+    unix_ms = (timestamp - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+    value = (unix_ms << 80) | (0x7 << 76) | (0b10 << 62) | (row_id & ((1 << 62) - 1))
+    return str(uuid.UUID(int=value))
@@ -0,0 +1,37 @@
+import numpy as np
+
+SAMPLE_FORMATS = ("int16", "float32")
+SAMPLE_SIZES = {"int16": 2, "float32": 4}
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+def float32_to_int16(samples):
+    """
+    16-bit little-endian PCM bytes from float samples in [-1, 1].
+
+    `samples` is a writable buffer of little-endian float32 (e.g. a
+    bytearray holding the request body) or a float32 array. It is viewed
+    with np.frombuffer and clipped and scaled in place, so the only new
+    allocation is the int16 output, half the input's size.
+    """
+    if not isinstance(samples, np.ndarray):
+        samples = np.frombuffer(samples, dtype="<f4")
+    np.clip(samples, -1.0, 1.0, out=samples)
+    np.multiply(samples, 32767, out=samples)
+    return samples.astype("<i2").tobytes()
+
+def to_int16_pcm(body, sample_format):
+    """
+    16-bit little-endian PCM bytes from a raw PCM body in `sample_format`.
+
+    Int16 bodies are returned unchanged. Float32 bodies must be writable
+    (a bytearray). Raises ValueError on an unknown format or a body that
+    is not a whole number of samples.
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Unsupported sample format '{sample_format}', expected one of {', '.join(SAMPLE_FORMATS)}")
+    if len(body) % SAMPLE_SIZES[sample_format]:
+        raise ValueError(f"Body length {len(body)} is not a whole number of {sample_format} samples")
+    if sample_format == "int16":
+        return bytes(body)
+    return float32_to_int16(body)
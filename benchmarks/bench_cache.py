@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for ResponseCache.
+
+Fills the cache to capacity and then measures the cost of get and of set
+(which evicts on every call once the cache is full) as max_size grows.
+Per-operation times should stay flat.
+
+Run from the project root: python benchmarks/bench_cache.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.cache import ResponseCache
+
+SIZES = [1_000, 10_000, 100_000, 500_000]
+OPS = 50_000
+PROMPT_PREFIX = "You are Yara, a friendly and helpful AI voice assistant. " * 5
+
+
+def bench(max_size):
+    cache = ResponseCache(max_size=max_size, ttl_seconds=3600, max_bytes=4 * 1024 ** 3)
+    for i in range(max_size):
+        cache.set(f"{PROMPT_PREFIX}User: question {i}\nYara:", f"answer {i}")
+
+    keys = [f"{PROMPT_PREFIX}User: question {i}\nYara:" for i in (j % max_size for j in range(OPS))]
+    start = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    get_us = (time.perf_counter() - start) / OPS * 1e6
+
+    new_keys = [f"{PROMPT_PREFIX}User: new question {i}\nYara:" for i in range(OPS)]
+    start = time.perf_counter()
+    for key in new_keys:
+        cache.set(key, "fresh answer")
+    set_us = (time.perf_counter() - start) / OPS * 1e6
+
+    return get_us, set_us, cache.stats()
+
+
+def main():
+    print(f"{'max_size':>10} {'get (us)':>10} {'set+evict (us)':>15} {'evictions':>10} {'MiB':>8}")
+    for size in SIZES:
+        get_us, set_us, stats = bench(size)
+        print(f"{size:>10} {get_us:>10.2f} {set_us:>15.2f} {stats['evictions']:>10} "
+              f"{stats['bytes'] / 1024 ** 2:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Concurrent chat history writes to SQLite, default engine vs. tuned profile.
+
+WORKERS processes (standing in for gunicorn workers) each insert exchanges
+into the same SQLite file for DURATION seconds while READERS processes keep
+reading recent history, first with SQLAlchemy's default engine settings
+(rollback journal, synchronous=FULL) and then with the profile from
+app/database.py (WAL, synchronous=NORMAL, busy_timeout, mmap). Reports
+write and read throughput and how many operations failed with
+"database is locked".
+
+Run from the project root: python benchmarks/bench_db_writes.py
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.database import db, engine_options, _set_sqlite_pragmas
+from app.models.chat_history import ChatHistory
+
+WORKERS = 4
+READERS = 2
+DURATION = 3.0
+TABLE = ChatHistory.__table__
+
+
+def make_engine(url, tuned):
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def writer(url, tuned, worker, results):
+    engine = make_engine(url, tuned)
+    done = failed = 0
+    stop_at = time.monotonic() + DURATION
+    while time.monotonic() < stop_at:
+        now = datetime.utcnow()
+        rows = [
+            {"session_id": f"session-{worker}-{done % 50}", "message": "question " * 20, "is_user": True, "timestamp": now},
+            {"session_id": f"session-{worker}-{done % 50}", "message": "answer " * 60, "is_user": False, "timestamp": now},
+        ]
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(TABLE), rows)
+            done += 1
+        except OperationalError:
+            failed += 1
+    results.put(("write", done, failed))
+
+
+def reader(url, tuned, worker, results):
+    engine = make_engine(url, tuned)
+    done = failed = 0
+    stop_at = time.monotonic() + DURATION
+    query = (
+        select(TABLE.c.message, TABLE.c.is_user)
+        .where(TABLE.c.session_id == f"session-0-{worker}")
+        .order_by(TABLE.c.timestamp.desc())
+        .limit(20)
+    )
+    while time.monotonic() < stop_at:
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).all()
+            done += 1
+        except OperationalError:
+            failed += 1
+    results.put(("read", done, failed))
+
+
+def run(tuned):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(url, tuned)
+        db.metadata.create_all(engine)
+        engine.dispose()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer, args=(url, tuned, i, results)) for i in range(WORKERS)]
+        processes += [multiprocessing.Process(target=reader, args=(url, tuned, i, results)) for i in range(READERS)]
+        for process in processes:
+            process.start()
+        totals = {"write": [0, 0], "read": [0, 0]}
+        for _ in processes:
+            kind, done, failed = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += failed
+        for process in processes:
+            process.join()
+        return totals
+
+
+def main():
+    print(f"{WORKERS} writer and {READERS} reader processes, {DURATION:.0f}s each")
+    print(f"{'profile':>8} {'exchanges/s':>12} {'reads/s':>10} {'locked writes':>14} {'locked reads':>13}")
+    for tuned in (False, True):
+        totals = run(tuned)
+        print(f"{'tuned' if tuned else 'default':>8} {totals['write'][0] / DURATION:>12.0f} "
+              f"{totals['read'][0] / DURATION:>10.0f} {totals['write'][1]:>14} {totals['read'][1]:>13}")
+
+
+if __name__ == "__main__":
+    main()
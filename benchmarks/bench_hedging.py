@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Deadlines and hedged requests against a local fake model.
+
+FakeModel mimics GenerativeModel.generate_content with a configurable
+latency distribution: mostly log-normal around MEDIAN_MS, with a fraction
+SLOW_FRACTION of calls stalling for SLOW_MS. The script reports latency
+percentiles for plain calls, hedged calls, and calls bounded by a
+deadline, which should never wait much past it.
+
+Run from the project root: python benchmarks/bench_hedging.py
+"""
+
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.deadline import Deadline, DeadlineExceeded, hedge_stats, run_with_deadline
+from app.services.sync_rate_limiter import SyncRateLimiter
+
+MEDIAN_MS = 40
+SIGMA = 0.3
+SLOW_FRACTION = 0.05
+SLOW_MS = 1000
+REQUESTS = 200
+CONCURRENCY = 8
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel with a configurable latency distribution"""
+
+    def __init__(self, median_ms=MEDIAN_MS, sigma=SIGMA, slow_fraction=SLOW_FRACTION, slow_ms=SLOW_MS):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.slow_fraction = slow_fraction
+        self.slow_ms = slow_ms
+
+    def sample_latency(self):
+        if random.random() < self.slow_fraction:
+            return self.slow_ms / 1000
+        return random.lognormvariate(0, self.sigma) * self.median_ms / 1000
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.sample_latency())
+        return FakeResponse(f"Echo: {prompt}")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+    return f"p50={pick(50):6.1f}ms p95={pick(95):6.1f}ms p99={pick(99):6.1f}ms max={samples[-1] * 1000:6.1f}ms"
+
+
+def run(label, call):
+    latencies = []
+    failures = 0
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            call(f"question {i}")
+            return time.perf_counter() - start, False
+        except DeadlineExceeded:
+            return time.perf_counter() - start, True
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        for latency, failed in pool.map(one, range(REQUESTS)):
+            latencies.append(latency)
+            failures += failed
+    print(f"{label:<28} {percentiles(latencies)} timeouts={failures}")
+    return latencies
+
+
+def main():
+    random.seed(7)
+    model = FakeModel()
+    limiter = SyncRateLimiter(rate_limit=10000, per_seconds=1, burst_limit=1000)
+
+    def plain(prompt):
+        return limiter.execute(run_with_deadline, lambda: model.generate_content(prompt))
+
+    def hedged(prompt):
+        return limiter.execute(
+            run_with_deadline,
+            lambda: model.generate_content(prompt),
+            hedge_after=2 * MEDIAN_MS / 1000,
+            can_hedge=lambda: limiter.acquire(timeout=0),
+        )
+
+    def bounded(prompt):
+        deadline = Deadline(0.2)
+        return limiter.execute(
+            lambda: run_with_deadline(lambda: model.generate_content(prompt), deadline=deadline),
+            deadline=deadline,
+        )
+
+    run("plain", plain)
+    run(f"hedged after {2 * MEDIAN_MS}ms", hedged)
+    print(f"{'':<28} hedged={hedge_stats['hedged']} hedge_wins={hedge_stats['hedge_wins']}")
+    latencies = run("deadline 200ms", bounded)
+    assert max(latencies) < 0.3, "a call waited well past its deadline"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
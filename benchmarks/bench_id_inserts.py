@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Primary key inserts: random UUIDv4 vs. time-ordered UUIDv7.
+
+Inserts ROWS chat-history-shaped rows in batches of BATCH into a SQLite
+table keyed the way ChatHistory stores its id there (32 hex characters),
+once with uuid4 keys and once with app.utils.ids.uuid7 keys. The page
+cache is kept small (CACHE_MIB) so the primary key index soon outgrows
+it, as it would on a busy server. Random keys land on random index pages
+and slow down as the index grows; time-ordered keys always append to the
+rightmost page. Reports throughput of the first and last segment and the
+final file size.
+
+Run from the project root: python benchmarks/bench_id_inserts.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.ids import uuid7
+
+ROWS = 1_000_000
+BATCH = 1_000
+SEGMENT = 100_000
+CACHE_MIB = 8
+MESSAGE = "How is the weather today in Paris? " * 3
+
+
+def run(make_id):
+    keys = [uuid.UUID(make_id()).hex for _ in range(ROWS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_MIB * 1024}")
+        conn.execute(
+            "CREATE TABLE chat_history (id CHAR(32) PRIMARY KEY, session_id VARCHAR(255) NOT NULL, "
+            "message TEXT NOT NULL, is_user BOOLEAN NOT NULL, timestamp DATETIME NOT NULL)"
+        )
+
+        segments = []
+        segment_start = time.perf_counter()
+        for start in range(0, ROWS, BATCH):
+            rows = [(key, f"session-{i % 1000}", MESSAGE, i % 2, "2026-01-01 00:00:00")
+                    for i, key in enumerate(keys[start:start + BATCH], start)]
+            with conn:
+                conn.executemany("INSERT INTO chat_history VALUES (?, ?, ?, ?, ?)", rows)
+            if (start + BATCH) % SEGMENT == 0:
+                now = time.perf_counter()
+                segments.append(SEGMENT / (now - segment_start))
+                segment_start = now
+
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        size_mib = os.path.getsize(path) / 1024 ** 2
+    return segments, size_mib
+
+
+def main():
+    print(f"{ROWS} rows, batches of {BATCH}, {CACHE_MIB} MiB page cache")
+    print(f"{'keys':>6} {'first 100k rows/s':>18} {'last 100k rows/s':>17} {'file MiB':>9}")
+    for name, make_id in (("uuid4", lambda: str(uuid.uuid4())), ("uuid7", uuid7)):
+        segments, size_mib = run(make_id)
+        print(f"{name:>6} {segments[0]:>18.0f} {segments[-1]:>17.0f} {size_mib:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Check that SyncRateLimiter runs calls concurrently.
+
+N callers within the burst limit each make a call that sleeps for
+CALL_LATENCY seconds. With the token reserved outside the call they should
+all finish in about one call's latency, not N of them.
+
+Run from the project root: python benchmarks/bench_rate_limiter.py
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sync_rate_limiter import SyncRateLimiter
+
+CALL_LATENCY = 0.2
+CALLERS = 10
+
+
+def slow_call():
+    time.sleep(CALL_LATENCY)
+    return True
+
+
+def run_burst(limiter, callers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda _: limiter.execute(slow_call), range(callers)))
+    return time.perf_counter() - start, results
+
+
+def run_fifo_order():
+    """Callers that queue for tokens are served in arrival order"""
+    limiter = SyncRateLimiter(rate_limit=20, per_seconds=1, burst_limit=1)
+    limiter.acquire()
+    order = []
+
+    def waiter(i):
+        limiter.acquire(timeout=5)
+        order.append(i)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        for i in range(5):
+            pool.submit(waiter, i)
+            time.sleep(0.005)
+    return order
+
+
+def main():
+    limiter = SyncRateLimiter(rate_limit=60, per_seconds=60, burst_limit=CALLERS)
+    elapsed, results = run_burst(limiter, CALLERS)
+    print(f"{CALLERS} concurrent calls of {CALL_LATENCY:.2f}s: {elapsed:.3f}s total")
+    assert all(results)
+    assert elapsed < CALL_LATENCY * 2, "calls were serialized by the limiter"
+
+    limiter = SyncRateLimiter(rate_limit=60, per_seconds=60, burst_limit=1)
+    limiter.acquire()
+    start = time.perf_counter()
+    acquired = limiter.acquire(timeout=0.1)
+    waited = time.perf_counter() - start
+    print(f"Empty bucket, 0.1s deadline: acquired={acquired} after {waited:.3f}s")
+    assert not acquired and waited < 0.2
+
+    order = run_fifo_order()
+    print(f"Queued callers served in order: {order}")
+    assert order == sorted(order)
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Recent-history reads: SessionBuffer vs. the ChatHistory ORM query.
+
+Fills a temporary SQLite database with SESSIONS sessions of MESSAGES_PER_SESSION
+messages each, then reads the last RECENT messages of random sessions,
+once through full ChatHistory entities (the old context-building path)
+and through the session buffer, which loads each session from the
+database once. With `trust_seconds` 0 it then checks on every read, with
+one index-only query, that its newest message is still the newest; with
+the default it only checks a session last confirmed over TRUST_SECONDS
+ago. Also reports the buffer's memory use per buffered message.
+
+Run from the project root: python benchmarks/bench_session_buffer.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from app.database import db
+from app.models.chat_history import ChatHistory
+from app.services.session_buffer import SessionBuffer
+
+SESSIONS = 200
+MESSAGES_PER_SESSION = 200
+RECENT = 20
+READS = 5_000
+TRUST_SECONDS = 2.0
+
+
+def seed():
+    start = datetime(2026, 1, 1)
+    rows = []
+    for s in range(SESSIONS):
+        for m in range(MESSAGES_PER_SESSION):
+            rows.append({
+                "session_id": f"session-{s}",
+                "message": f"message {m} of session {s} " + "lorem ipsum " * 10,
+                "is_user": m % 2 == 0,
+                "timestamp": start + timedelta(seconds=m),
+            })
+    db.session.execute(db.insert(ChatHistory), rows)
+    db.session.commit()
+
+
+def read_orm(session_id):
+    rows = (
+        ChatHistory.query
+        .filter_by(session_id=session_id)
+        .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+        .limit(RECENT)
+        .all()
+    )
+    return [(row.is_user, row.message) for row in reversed(rows)]
+
+
+def timed(read, session_ids):
+    start = time.perf_counter()
+    for session_id in session_ids:
+        read(session_id)
+    return (time.perf_counter() - start) / len(session_ids) * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            seed()
+
+            random.seed(0)
+            session_ids = [f"session-{random.randrange(SESSIONS)}" for _ in range(READS)]
+            orm_us = timed(read_orm, session_ids)
+            results = []
+            for trust_seconds in (0, TRUST_SECONDS):
+                buffer = SessionBuffer(max_turns=50, max_sessions=SESSIONS, trust_seconds=trust_seconds)
+                buffer_us = timed(lambda session_id: buffer.recent(session_id, RECENT), session_ids)
+                results.append((trust_seconds, buffer_us, buffer.stats()))
+
+    print(f"{READS} reads of the last {RECENT} messages across {SESSIONS} sessions")
+    print(f"{'ORM query (us/read)':>30}: {orm_us:10.1f}")
+    for trust_seconds, buffer_us, stats in results:
+        label = f"buffer, trust {trust_seconds:g} s (us/read)"
+        print(f"{label:>30}: {buffer_us:10.1f}  "
+              f"({stats['misses']} loads, {stats['checks']} freshness queries, {stats['hits']} hits)")
+    buffered = stats["sessions"] * buffer.max_turns
+    print(f"{'buffer memory':>30}: {stats['bytes'] / 1024 ** 2:10.1f} MiB "
+          f"({stats['bytes'] / buffered:.0f} bytes/message)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Time to first audio: sequential voice replies vs. the sentence pipeline.
+
+A fake reply stream produces SENTENCES sentences, taking LLM_MS_PER_SENTENCE
+to generate each one, and a fake TTS takes TTS_MS_BASE plus TTS_MS_PER_CHAR
+per character to synthesize a text. The sequential path waits for the whole
+reply and then synthesizes all of it at once, as /api/voice/process does;
+the pipelined path runs app.services.voice_pipeline.VoicePipeline, as
+/api/voice/process/stream does. Reports time to first audio and to the
+last segment for several pipeline widths.
+
+Run from the project root: python benchmarks/bench_voice_pipeline.py
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TTS_CACHE_DIR"] = ""  # Measure synthesis, not the audio cache
+
+from app.services.voice_pipeline import VoicePipeline
+
+SENTENCES = 6
+LLM_MS_PER_SENTENCE = 250
+TTS_MS_BASE = 150
+TTS_MS_PER_CHAR = 4
+SENTENCE = "This is one sentence of a longer spoken answer from the assistant."
+WIDTHS = (1, 2, 3, 4)
+
+
+def reply_pieces():
+    """Stand-in for gemini_service.get_chat_response_stream: a few pieces per sentence"""
+    words = SENTENCE.split(" ")
+    for _ in range(SENTENCES):
+        for word in words:
+            time.sleep(LLM_MS_PER_SENTENCE / 1000 / len(words))
+            yield word + " "
+
+
+class FakeTTS:
+    """Stand-in for TTSService on top of a TTS engine with unlimited sessions"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=16)
+
+    @staticmethod
+    def synthesize(text):
+        time.sleep((TTS_MS_BASE + TTS_MS_PER_CHAR * len(text)) / 1000)
+        return b"\xff\xf3" * len(text)
+
+    def cache_key(self, text):
+        return None
+
+    def speech_future(self, text):
+        return self.executor.submit(self.synthesize, text)
+
+
+def sequential():
+    start = time.perf_counter()
+    text = "".join(reply_pieces()).strip()
+    FakeTTS.synthesize(text)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def pipelined(width, tts):
+    pipeline = VoicePipeline(max_parallel=width, min_sentence_chars=20)
+    start = time.perf_counter()
+    first = None
+    for _ in pipeline.segments(reply_pieces(), tts):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    tts = FakeTTS()
+    print(f"{SENTENCES} sentences, {LLM_MS_PER_SENTENCE} ms LLM per sentence, "
+          f"TTS {TTS_MS_BASE} ms + {TTS_MS_PER_CHAR} ms/char")
+    print(f"{'mode':>14} {'first audio ms':>15} {'last audio ms':>14}")
+    first, last = sequential()
+    print(f"{'sequential':>14} {first * 1000:>15.0f} {last * 1000:>14.0f}")
+    for width in WIDTHS:
+        first, last = pipelined(width, tts)
+        print(f"{f'pipeline x{width}':>14} {first * 1000:>15.0f} {last * 1000:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Wake-word audio ingestion: JSON float arrays vs. raw PCM bodies.
+
+Builds SECONDS of 16 kHz audio in BUFFER-sample buffers, as wakeword.js
+captures it, and encodes each buffer three ways: the legacy JSON
+{"audio_data": [floats]}, raw float32 PCM, and raw int16 PCM. For each it
+reports the request bytes and the server CPU time per second of audio
+spent turning the body into the 16-bit PCM the recognizer takes, using
+the same conversions as /api/wakeword/detect.
+
+Run from the project root: python benchmarks/bench_wakeword_ingest.py
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pcm import float32_to_int16, to_int16_pcm
+
+SAMPLE_RATE = 16000
+BUFFER = 4096
+SECONDS = 60
+ROUNDS = 3
+
+
+def make_buffers():
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE * SECONDS) / SAMPLE_RATE
+    audio = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(t.size)
+    audio = audio.astype(np.float32)
+    return [audio[i:i + BUFFER] for i in range(0, audio.size, BUFFER)]
+
+
+def decode_json(body):
+    data = json.loads(body)
+    return float32_to_int16(np.array(data["audio_data"], dtype=np.float32))
+
+
+def decode_float32(body):
+    # The route reads the body straight into a bytearray; copy here to keep the input reusable
+    return to_int16_pcm(bytearray(body), "float32")
+
+
+def decode_int16(body):
+    return to_int16_pcm(body, "int16")
+
+
+def cpu_per_audio_second(decode, bodies):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.process_time()
+        for body in bodies:
+            decode(body)
+        best = min(best, time.process_time() - start)
+    return best / SECONDS
+
+
+def main():
+    buffers = make_buffers()
+    encodings = {
+        # Array.from(Float32Array) serializes each sample as a double, like tolist() here
+        "json": ([json.dumps({"audio_data": buf.tolist()}).encode() for buf in buffers], decode_json),
+        "float32": ([buf.astype("<f4").tobytes() for buf in buffers], decode_float32),
+        "int16": ([(np.clip(buf, -1, 1) * 32767).astype("<i2").tobytes() for buf in buffers], decode_int16),
+    }
+
+    print(f"{SECONDS} s of {SAMPLE_RATE} Hz audio in {len(buffers)} buffers of {BUFFER} samples")
+    print(f"{'body':>8} {'bytes/request':>14} {'KiB per audio s':>16} {'server CPU ms per audio s':>26}")
+    for name, (bodies, decode) in encodings.items():
+        total = sum(len(body) for body in bodies)
+        cpu = cpu_per_audio_second(decode, bodies)
+        print(f"{name:>8} {total / len(bodies):>14.0f} {total / SECONDS / 1024:>16.1f} {cpu * 1000:>26.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Many always-listening clients on one WebSocket wake-word server.
+
+Starts a WakeWordStreamServer in a child process with a fake detector
+whose recognizers spend RECOGNIZER_MS of GIL-free time per frame (vosk's
+decoding runs in C) and report the wake word for frames starting with a
+marker byte. CLIENTS connections then stream FRAME_MS frames of 16 kHz
+int16 audio in real time for SECONDS seconds; every WAKE_EVERY seconds
+each client sends a marked frame and times the `wake_word` event that
+comes back. Reports event latency percentiles and the server's stats.
+
+Run from the project root: python benchmarks/bench_wakeword_stream.py
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+
+from app.services.wakeword_stream import WakeWordStreamServer
+
+CLIENTS = 300
+SECONDS = 10
+FRAME_MS = 100
+WAKE_EVERY = 2.0
+RECOGNIZER_MS = 0.3
+THREADS = 4
+PORT = 8790
+SAMPLE_RATE = 16000
+WAKE_MARKER = b"\x01"
+
+
+class FakeRecognizer:
+    def AcceptWaveform(self, pcm):
+        time.sleep(RECOGNIZER_MS / 1000)
+        return pcm[:1] == WAKE_MARKER
+
+    def Result(self):
+        return '{"text": "yara"}'
+
+    def PartialResult(self):
+        return '{"partial": ""}'
+
+    def Reset(self):
+        pass
+
+
+class FakeDetector:
+    wake_word = "yara"
+
+    def new_recognizer(self, sample_rate):
+        return FakeRecognizer()
+
+
+def run_server():
+    server = WakeWordStreamServer(FakeDetector(), max_streams=CLIENTS + 10, idle_timeout=30, threads=THREADS)
+    asyncio.run(server.serve("127.0.0.1", PORT))
+
+
+async def client(latencies):
+    frame = b"\x00" * (SAMPLE_RATE * FRAME_MS // 1000 * 2)
+    wake_frame = WAKE_MARKER + frame[1:]
+    await asyncio.sleep(random.random() * FRAME_MS / 1000)  # Spread clients across the frame period
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}/", max_queue=None) as ws:
+        await ws.recv()  # ready
+        sent_at = None
+
+        async def receive():
+            async for message in ws:
+                if json.loads(message)["type"] == "wake_word" and sent_at is not None:
+                    latencies.append(time.perf_counter() - sent_at)
+
+        receiver = asyncio.create_task(receive())
+        start = time.perf_counter()
+        next_wake = start + random.random() * WAKE_EVERY
+        next_frame = start
+        while next_frame - start < SECONDS:
+            if time.perf_counter() >= next_wake:
+                sent_at = time.perf_counter()
+                await ws.send(wake_frame)
+                next_wake += WAKE_EVERY
+            else:
+                await ws.send(frame)
+            next_frame += FRAME_MS / 1000
+            await asyncio.sleep(max(0, next_frame - time.perf_counter()))
+        await asyncio.sleep(0.5)
+        receiver.cancel()
+
+
+async def run_clients():
+    latencies = []
+    await asyncio.gather(*(client(latencies) for _ in range(CLIENTS)))
+    return latencies
+
+
+def main():
+    server = multiprocessing.Process(target=run_server, daemon=True)
+    server.start()
+    time.sleep(1.0)
+    try:
+        latencies = sorted(asyncio.run(run_clients()))
+        stats = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health").read())
+    finally:
+        server.terminate()
+
+    pick = lambda p: latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+    print(f"{CLIENTS} clients x {SECONDS} s of audio in {FRAME_MS} ms frames, "
+          f"{RECOGNIZER_MS} ms recognizer time per frame, {THREADS} threads")
+    print(f"wake events: {len(latencies)}  latency p50={pick(50):.1f}ms p95={pick(95):.1f}ms "
+          f"p99={pick(99):.1f}ms max={latencies[-1] * 1000:.1f}ms")
+    print(f"server: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
 from functools import wraps
 from flask import jsonify
+from app.services.upstream_health import UpstreamUnavailable, is_quota_error
 import logging
 
+def rate_limit_response(e):
+    """JSON error response with a Retry-After header for a throttled request"""
+    retry_after = getattr(e, 'retry_after', 10)
+    status_code = getattr(e, 'status_code', 429)
+    response = jsonify({
+        'error': 'rate_limit_exceeded' if status_code == 429 else 'service_unavailable',
+        'message': ('The service is experiencing high demand. '
+                    'Please try again in a few moments.'),
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status_code
+
 def handle_rate_limit_errors(f):
     """Decorator to handle rate limit errors gracefully"""
     @wraps(f)
@@ -9,18 +23,11 @@ def handle_rate_limit_errors(f):
         try:
             return f(*args, **kwargs)
         except Exception as e:
-            error_message = str(e).lower()
-            
-            if "quota exceeded" in error_message or "rate limit" in error_message:
+            if isinstance(e, UpstreamUnavailable) or is_quota_error(e):
                 logging.warning(f"Rate limit error: {e}")
-                return jsonify({
-                    'error': 'rate_limit_exceeded',
-                    'message': ('The service is experiencing high demand. '
-                              'Please try again in a few moments.'),
-                    'retry_after': 10  # Suggest retry after 10 seconds
-                }), 429
+                return rate_limit_response(e)
             
             # Re-raise other exceptions
             raise
     
-    return decorated_function
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,23 @@
+/*
+  # Composite index for paginated chat history
+
+  1. Indexes
+    - Add `idx_chat_history_session_timestamp` on (`session_id`, `timestamp`)
+    - Drop `idx_chat_history_session_id`, which the composite index makes redundant
+
+  2. Notes
+    - `/api/chat/history` pages through a session with keyset queries on
+      (timestamp, id); this index serves both the session filter and the order
+    - Migrations run inside a transaction, so the index cannot be built
+      CONCURRENTLY here and writes to chat_history wait while it is built.
+      On a large table, run the CREATE INDEX CONCURRENTLY statement below by
+      hand (outside a transaction) before applying this migration; IF NOT
+      EXISTS then makes the migration a no-op for it:
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chat_history_session_timestamp
+          ON chat_history(session_id, timestamp);
+*/
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_session_timestamp
+  ON chat_history(session_id, timestamp);
+
+DROP INDEX IF EXISTS idx_chat_history_session_id;
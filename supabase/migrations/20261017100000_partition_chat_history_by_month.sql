@@ -0,0 +1,117 @@
+/*
+  # Partition chat_history by month and add the archive index
+
+  1. Changes
+    - `chat_history` becomes a table range-partitioned on `timestamp`, one
+      partition per month (`chat_history_yYYYYmMM`) plus a default partition
+    - The primary key becomes (`id`, `timestamp`); partitioned tables need the
+      partition key in every unique constraint
+    - Existing rows are copied into the new partitions and the old table is dropped
+
+  2. New Functions
+    - `create_chat_history_partition(month date)` - creates the partition for
+      the month containing `month` if it does not exist yet. The compaction job
+      (`flask compact-history`) calls it for the current and next month.
+
+  3. New Tables
+    - `chat_history_archive` - one row per archived session: the archive file,
+      the byte range of the session's gzip member, and its time span
+
+  4. Security
+    - RLS and the public policies are recreated on `chat_history`
+    - RLS is enabled on `chat_history_archive` without public policies
+
+  5. Notes
+    - Inserts and lookups touch only the partitions for the months involved,
+      and their indexes stay small no matter how much history builds up
+    - Once the compaction job has archived every session of a month older than
+      the retention window, it drops that month's partition
+*/
+
+ALTER TABLE chat_history RENAME TO chat_history_unpartitioned;
+
+CREATE TABLE chat_history (
+  id uuid NOT NULL DEFAULT gen_random_uuid(),
+  session_id text NOT NULL,
+  message text NOT NULL,
+  is_user boolean NOT NULL DEFAULT true,
+  timestamp timestamptz NOT NULL DEFAULT now(),
+  created_at timestamptz DEFAULT now(),
+  PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE chat_history_default PARTITION OF chat_history DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_chat_history_partition(month date)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  start_at date := date_trunc('month', month)::date;
+  partition_name text := format('chat_history_y%sm%s', to_char(start_at, 'YYYY'), to_char(start_at, 'MM'));
+BEGIN
+  EXECUTE format(
+    'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_history FOR VALUES FROM (%L) TO (%L)',
+    partition_name, start_at, (start_at + interval '1 month')::date
+  );
+  RETURN partition_name;
+END;
+$$;
+
+-- Partitions for existing data and the months just ahead
+SELECT create_chat_history_partition(month)
+FROM (
+  SELECT DISTINCT date_trunc('month', timestamp)::date AS month FROM chat_history_unpartitioned
+  UNION
+  SELECT (date_trunc('month', now()) + n * interval '1 month')::date FROM generate_series(0, 2) AS n
+) AS months;
+
+INSERT INTO chat_history (id, session_id, message, is_user, timestamp, created_at)
+SELECT id, session_id, message, is_user, timestamp, created_at FROM chat_history_unpartitioned;
+
+DROP TABLE chat_history_unpartitioned;
+
+-- Created on the parent, so every partition gets its own copy
+CREATE INDEX IF NOT EXISTS idx_chat_history_session_timestamp ON chat_history(session_id, timestamp);
+
+-- Enable Row Level Security
+ALTER TABLE chat_history ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow public read access"
+  ON chat_history
+  FOR SELECT
+  USING (true);
+
+CREATE POLICY "Allow public insert access"
+  ON chat_history
+  FOR INSERT
+  WITH CHECK (true);
+
+CREATE POLICY "Allow public update access"
+  ON chat_history
+  FOR UPDATE
+  USING (true)
+  WITH CHECK (true);
+
+CREATE POLICY "Allow public delete access"
+  ON chat_history
+  FOR DELETE
+  USING (true);
+
+-- Archive index
+CREATE TABLE IF NOT EXISTS chat_history_archive (
+  id bigserial PRIMARY KEY,
+  session_id text NOT NULL,
+  month text NOT NULL,
+  path text NOT NULL,
+  byte_offset bigint NOT NULL,
+  length integer NOT NULL,
+  message_count integer NOT NULL,
+  first_timestamp timestamptz NOT NULL,
+  last_timestamp timestamptz NOT NULL,
+  archived_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_archive_session_id ON chat_history_archive(session_id);
+
+ALTER TABLE chat_history_archive ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,20 @@
+/*
+  # Full-text search over chat_history
+
+  1. Changes
+    - Add `message_tsv` (tsvector), generated from `message` with the English
+      configuration and stored, so it never drifts from the message text
+    - Add GIN index `idx_chat_history_message_tsv` on it
+
+  2. Notes
+    - `GET /api/chat/search` matches with `websearch_to_tsquery` and ranks with
+      `ts_rank_cd`; only the returned page gets a `ts_headline` snippet
+    - Both the column and the index are declared on the partitioned parent, so
+      every monthly partition (and partitions created later) gets them
+*/
+
+ALTER TABLE chat_history
+  ADD COLUMN IF NOT EXISTS message_tsv tsvector
+  GENERATED ALWAYS AS (to_tsvector('english', message)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_chat_history_message_tsv ON chat_history USING GIN (message_tsv);
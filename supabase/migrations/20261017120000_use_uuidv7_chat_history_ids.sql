@@ -0,0 +1,38 @@
+/*
+  # Time-ordered (UUIDv7) ids for chat_history
+
+  1. New Functions
+    - `uuid_generate_v7()` - RFC 9562 UUIDv7: 48-bit Unix milliseconds
+      followed by random bits, built on `gen_random_uuid()` (no extension needed)
+
+  2. Changes
+    - `chat_history.id` defaults to `uuid_generate_v7()` instead of
+      `gen_random_uuid()`
+
+  3. Notes
+    - The application generates the same kind of id itself (`app/utils/ids.py`)
+      before inserting, so the default only applies to rows written by other
+      clients
+    - Time-ordered keys append to the right edge of the primary key index
+      instead of splitting random pages on every insert
+    - Existing rows keep their random ids; history pagination orders by
+      (timestamp, id), so they remain reachable
+*/
+
+CREATE OR REPLACE FUNCTION uuid_generate_v7()
+RETURNS uuid
+LANGUAGE plpgsql
+VOLATILE
+AS $$
+DECLARE
+  unix_ms bigint := floor(extract(epoch FROM clock_timestamp()) * 1000);
+  bytes bytea := uuid_send(gen_random_uuid());
+BEGIN
+  -- Bytes 0-5: timestamp; byte 6 high nibble: version 7 (the v4 variant bits are already correct)
+  bytes := overlay(bytes PLACING substring(int8send(unix_ms) FROM 3) FROM 1 FOR 6);
+  bytes := set_byte(bytes, 6, (get_byte(bytes, 6) & 15) | 112);
+  RETURN encode(bytes, 'hex')::uuid;
+END;
+$$;
+
+ALTER TABLE chat_history ALTER COLUMN id SET DEFAULT uuid_generate_v7();
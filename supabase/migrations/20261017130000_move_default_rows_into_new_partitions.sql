@@ -0,0 +1,59 @@
+/*
+  # Let create_chat_history_partition() adopt rows from the default partition
+
+  1. Changes
+    - `create_chat_history_partition(month date)` no longer fails when rows of
+      that month were already written to `chat_history_default` (e.g. the
+      compaction job did not run before the month started). It detaches the
+      default partition, creates the month's partition, moves the month's rows
+      into it and attaches the default partition again, all in the caller's
+      transaction.
+
+  2. Notes
+    - Without this, Postgres refuses to create the partition ("updated
+      partition constraint for default partition would be violated by some
+      row"), so every later compaction run fails too
+    - Moving rows locks `chat_history` for the duration; normally the
+      compaction job creates each partition ahead of its month and the default
+      partition stays empty, so nothing is moved
+*/
+
+CREATE OR REPLACE FUNCTION create_chat_history_partition(month date)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  start_at date := date_trunc('month', month)::date;
+  end_at date := (date_trunc('month', month) + interval '1 month')::date;
+  partition_name text := format('chat_history_y%sm%s', to_char(start_at, 'YYYY'), to_char(start_at, 'MM'));
+BEGIN
+  IF to_regclass(format('public.%I', partition_name)) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM chat_history_default WHERE timestamp >= start_at AND timestamp < end_at
+  ) THEN
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF chat_history FOR VALUES FROM (%L) TO (%L)',
+      partition_name, start_at, end_at
+    );
+    RETURN partition_name;
+  END IF;
+
+  ALTER TABLE chat_history DETACH PARTITION chat_history_default;
+  EXECUTE format(
+    'CREATE TABLE %I PARTITION OF chat_history FOR VALUES FROM (%L) TO (%L)',
+    partition_name, start_at, end_at
+  );
+  EXECUTE format(
+    'INSERT INTO %I (id, session_id, message, is_user, timestamp, created_at) '
+    'SELECT id, session_id, message, is_user, timestamp, created_at FROM chat_history_default '
+    'WHERE timestamp >= %L AND timestamp < %L',
+    partition_name, start_at, end_at
+  );
+  DELETE FROM chat_history_default WHERE timestamp >= start_at AND timestamp < end_at;
+  ALTER TABLE chat_history ATTACH PARTITION chat_history_default DEFAULT;
+  RETURN partition_name;
+END;
+$$;
@@ -0,0 +1,22 @@
+from app.services.query_cache import NearDuplicateIndex, normalize_query
+
+
+def test_operators_are_part_of_the_key():
+    keys = {normalize_query(q) for q in ("What is 2+2?", "what is 2-2", "What is 2*2", "Explain C++", "Explain C#")}
+    assert keys == {"what is 2+2", "what is 2-2", "what is 2*2", "explain c++", "explain c#"}
+
+
+def test_sentence_punctuation_is_ignored():
+    assert normalize_query('"What\'s the capital of France?"') == "what is the capital of france"
+    assert normalize_query("what is 3.5, exactly") == "what is 3.5 exactly"
+
+
+def test_operators_never_match_near_duplicates():
+    index = NearDuplicateIndex(capacity=8, dim=1024)
+    index.add(normalize_query("What is 2+2?"))
+    index.add(normalize_query("Explain C++"))
+
+    assert index.lookup(normalize_query("what is 2+2")) == "what is 2+2"
+    assert index.lookup(normalize_query("what is 2-2")) is None
+    assert index.lookup(normalize_query("What is 2*2")) is None
+    assert index.lookup(normalize_query("Explain C#")) is None
@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.sync_rate_limiter import SyncRateLimiter
+from app.services.upstream_health import QuotaExceeded
+
+CALL_LATENCY = 0.2
+
+
+def fake_call(value):
+    time.sleep(CALL_LATENCY)
+    return value
+
+
+def wait_for_waiters(limiter, count, timeout=2.0):
+    give_up_at = time.monotonic() + timeout
+    while len(limiter._waiters) < count:
+        assert time.monotonic() < give_up_at, "callers never queued"
+        time.sleep(0.001)
+
+
+def test_callers_within_burst_run_concurrently():
+    callers = 10
+    limiter = SyncRateLimiter(rate_limit=60, per_seconds=60, burst_limit=callers)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda i: limiter.execute(fake_call, i), range(callers)))
+    elapsed = time.monotonic() - start
+
+    assert results == list(range(callers))
+    assert elapsed < CALL_LATENCY * 2, f"{callers} calls took {elapsed:.2f}s; the limiter serialized them"
+
+
+def test_queued_callers_are_served_in_fifo_order():
+    limiter = SyncRateLimiter(rate_limit=50, per_seconds=1, burst_limit=1)
+    assert limiter.acquire(timeout=0)
+    order = []
+    lock = threading.Lock()
+
+    def waiter(i):
+        assert limiter.acquire(timeout=5)
+        with lock:
+            order.append(i)
+
+    threads = []
+    for i in range(6):
+        thread = threading.Thread(target=waiter, args=(i,))
+        thread.start()
+        wait_for_waiters(limiter, i + 1)
+        threads.append(thread)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == list(range(6))
+
+
+def test_acquire_gives_up_at_its_timeout():
+    limiter = SyncRateLimiter(rate_limit=1, per_seconds=60, burst_limit=1)
+    assert limiter.acquire(timeout=0)
+
+    start = time.monotonic()
+    assert not limiter.acquire(timeout=0.1)
+    elapsed = time.monotonic() - start
+
+    assert 0.09 <= elapsed < 0.3
+    assert not limiter._waiters
+
+
+def test_execute_raises_quota_exceeded_after_max_wait():
+    limiter = SyncRateLimiter(rate_limit=1, per_seconds=60, burst_limit=1, max_wait=0.1)
+    limiter.execute(lambda: None)
+    calls = []
+
+    start = time.monotonic()
+    with pytest.raises(QuotaExceeded) as raised:
+        limiter.execute(calls.append, 1)
+
+    assert time.monotonic() - start < 0.3
+    assert not calls
+    assert raised.value.retry_after >= 1
+
+
+def test_execute_stops_waiting_at_the_deadline():
+    limiter = SyncRateLimiter(rate_limit=1, per_seconds=60, burst_limit=1, max_wait=5)
+    limiter.execute(lambda: None)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        limiter.execute(lambda: None, deadline=Deadline(0.1))
+    assert time.monotonic() - start < 0.3
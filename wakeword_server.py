@@ -0,0 +1,35 @@
+# wakeword_server.py
+"""
+Standalone WebSocket server for streaming wake-word detection.
+
+Runs next to the web app (see the `wakeword` process in the procfile):
+    python wakeword_server.py
+"""
+from dotenv import load_dotenv
+
+# Load environment variables before Config reads them
+load_dotenv()
+
+from app.config import Config
+from app.services.wakeword_stream import create_stream_server
+import asyncio
+import logging
+import signal
+import sys
+
+async def main():
+    server = create_stream_server()
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+    await server.serve(Config.WAKEWORD_WS_HOST, Config.WAKEWORD_WS_PORT, stop=stop)
+    logging.info(f"Wake word stream server stopped: {server.stats()}")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    asyncio.run(main())